@@ -1,55 +1,305 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, Response, jsonify, request, render_template
 from flask_cors import CORS
+from flask_orjson import OrjsonProvider
+import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import threading
+import duckdb
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 app = Flask(__name__)
+# Serialize responses with orjson; numpy scalars/arrays are encoded natively
+app.json = OrjsonProvider(app)
+app.json.option = orjson.OPT_NAIVE_UTC | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
 CORS(app)
 
 # Path to the parquet file
 PARQUET_PATH = 'data/daily_ip_dandiset_stats.parquet'
 
-# Global variable to cache the dataframe
+# Alternate representation of the time series for clients that send a matching Accept header
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+
+# Columns loaded into memory for the whole-dataset aggregates and dataset details
+DATA_COLUMNS = ['dandiset_id', 'region_code', 'total_bytes_downloaded']
+
+
+def dumps_json(obj):
+    """Serialize an object to JSON bytes using the app's orjson options"""
+    return orjson.dumps(obj, option=app.json.option)
+
+def json_response(json_bytes):
+    """Wrap already-serialized JSON bytes in a response"""
+    return Response(json_bytes, mimetype='application/json')
+
+
+@dataclass
+class DataCache:
+    """Loaded parquet data plus the whole-dataset aggregates derived from it"""
+    df: pd.DataFrame
+    stats_json: bytes = b'{}'
+    datasets_json: bytes = b'[]'
+    featured_totals: Optional[pd.Series] = None
+
+
+# Global variable to cache the dataframe and its aggregates
 _df_cache = None
 _df_cache_timestamp = None
+_df_lock = threading.Lock()
 
-def load_data():
-    """Load and cache the parquet data"""
+def build_data_cache(df):
+    """Precompute the aggregates that do not depend on request parameters"""
+    # Aggregate by dataset
+    dataset_stats = df.groupby('dandiset_id', observed=True, sort=False).agg(
+        total_bytes=('total_bytes_downloaded', 'sum'),
+        unique_regions=('region_code', 'nunique'),
+        unique_countries=('country', 'nunique')
+    ).reset_index()
+    
+    # Sort by total bytes descending
+    dataset_stats = dataset_stats.sort_values('total_bytes', ascending=False)
+    dataset_stats['total_bytes'] = dataset_stats['total_bytes'].astype('int64')
+    
+    datasets = pd.DataFrame({
+        'id': dataset_stats['dandiset_id'].astype('int64').astype(str).str.zfill(6),  # Zero-pad to 6 digits
+        'total_bytes': dataset_stats['total_bytes'],
+        'total_bytes_formatted': format_bytes_array(dataset_stats['total_bytes'].to_numpy()),
+        'unique_regions': dataset_stats['unique_regions'],
+        'unique_countries': dataset_stats['unique_countries']
+    }).to_dict(orient='records')
+    
+    # Calculate overall statistics
+    total_bytes = int(df['total_bytes_downloaded'].sum())
+    unique_regions = int(df['region_code'].nunique())
+    
+    stats = {
+        'total_bytes': total_bytes,
+        'total_bytes_formatted': format_bytes(total_bytes),
+        'total_datasets': int(df['dandiset_id'].nunique()),
+        'unique_regions': unique_regions,
+        'unique_countries': int(df['country'].nunique()),
+        # Active regions are all regions with downloads
+        'active_regions': unique_regions
+    }
+    
+    # Top datasets by download volume, shown as featured dandisets
+    featured_totals = dataset_stats.set_index('dandiset_id')['total_bytes'].head(7)
+    
+    return DataCache(
+        df=df,
+        stats_json=dumps_json(stats),
+        datasets_json=dumps_json(datasets),
+        featured_totals=featured_totals
+    )
+
+def country_column(region_codes):
+    """Derive a categorical country column from categorical region codes"""
+    # Country is the part of the region code before the first '/'; split only the
+    # distinct region codes and map each row through its integer category code
+    country_codes, countries = pd.factorize(region_codes.cat.categories.str.split('/', n=1).str[0])
+    codes = region_codes.cat.codes.to_numpy()
+    return pd.Categorical.from_codes(np.where(codes >= 0, country_codes[codes], -1), categories=countries)
+
+def load_data_cache():
+    """Load and cache the parquet data along with its precomputed aggregates"""
     global _df_cache, _df_cache_timestamp
     
     # Cache for 5 minutes to avoid reloading on every request
     cache_duration = 300
     current_time = datetime.now().timestamp()
     
-    if _df_cache is None or (_df_cache_timestamp is None) or (current_time - _df_cache_timestamp) > cache_duration:
-        try:
-            _df_cache = pd.read_parquet(PARQUET_PATH)
-            _df_cache_timestamp = current_time
-            print(f"Loaded parquet data with {len(_df_cache)} rows")
-        except Exception as e:
-            print(f"Error loading parquet file: {e}")
-            # Return empty dataframe if file can't be loaded
-            _df_cache = pd.DataFrame()
+    def is_stale():
+        return _df_cache is None or (_df_cache_timestamp is None) or (current_time - _df_cache_timestamp) > cache_duration
+    
+    if is_stale():
+        with _df_lock:
+            # Another request may have reloaded the data while we waited for the lock
+            if is_stale():
+                try:
+                    # Filtered queries go to DuckDB, so only project the columns used in memory;
+                    # group/filter keys come back as categoricals so groupby hashes integer codes
+                    table = pa.dataset.dataset(PARQUET_PATH, format='parquet').to_table(columns=DATA_COLUMNS)
+                    df = table.to_pandas(categories=['region_code', 'dandiset_id'], self_destruct=True)
+                    del table
+                    df['country'] = country_column(df['region_code'])
+                    _df_cache = build_data_cache(df)
+                    _df_cache_timestamp = current_time
+                    print(f"Loaded parquet data with {len(df)} rows")
+                except Exception as e:
+                    print(f"Error loading parquet file: {e}")
+                    # Return empty dataframe if file can't be loaded
+                    _df_cache = DataCache(df=pd.DataFrame())
     
     return _df_cache
 
+def load_data():
+    """Load and cache the parquet data"""
+    return load_data_cache().df
+
+# Shared in-memory DuckDB connection for querying the parquet file directly
+_duckdb_conn = None
+_duckdb_lock = threading.Lock()
+
+def get_duckdb_cursor():
+    """Get a cursor on the DuckDB connection exposing the parquet file as the downloads view"""
+    global _duckdb_conn
+    
+    if _duckdb_conn is None:
+        with _duckdb_lock:
+            if _duckdb_conn is None:
+                conn = duckdb.connect(':memory:')
+                # DDL cannot take bound parameters, so the path is escaped as a SQL string literal
+                parquet_literal = str(PARQUET_PATH).replace("'", "''")
+                conn.execute(f"CREATE VIEW downloads AS SELECT * FROM read_parquet('{parquet_literal}')")
+                _duckdb_conn = conn
+    
+    # Cursors are separate connections to the same database, safe to use per request thread
+    return _duckdb_conn.cursor()
+
 @app.route('/')
 def index():
     """Serve the main dashboard page"""
     return render_template('index.html')
 
+BYTE_UNITS = np.array(['B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB'])
+
+def format_bytes_array(bytes_values):
+    """Format an array of byte counts into human readable strings"""
+    bytes_values = np.asarray(bytes_values, dtype=np.float64)
+    missing = np.isnan(bytes_values)
+    bytes_values = np.where(missing, 0.0, bytes_values)
+    
+    # Each unit is a factor of 2**10, so the unit index is floor(log2(bytes) / 10)
+    unit_index = np.clip(np.floor(np.log2(np.maximum(bytes_values, 1.0)) / 10).astype(np.int64), 0, len(BYTE_UNITS) - 1)
+    # log2 rounds up just below a unit boundary (e.g. 2**50 - 1); step those back down
+    unit_index -= (unit_index > 0) & (bytes_values < 1024.0 ** unit_index)
+    scaled = bytes_values / 1024.0 ** unit_index
+    formatted = np.char.add(np.char.mod('%.1f ', scaled), BYTE_UNITS[unit_index])
+    return np.where(missing, '0 B', formatted)
+
 def format_bytes(bytes_value):
     """Format bytes into human readable format"""
     if bytes_value is None or pd.isna(bytes_value):
         return "0 B"
     
-    bytes_value = float(bytes_value)
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB', 'PB']:
-        if bytes_value < 1024.0:
-            return f"{bytes_value:.1f} {unit}"
-        bytes_value /= 1024.0
-    return f"{bytes_value:.1f} EB"
+    return str(format_bytes_array([bytes_value])[0])
+
+def build_time_series_matrix(daily_data, key_column, top_keys):
+    """Sum daily downloads into a dense date x (top keys + OTHER) matrix"""
+    # daily_data holds one row per (date, key); map each row to a (date, column) cell
+    # whose columns are the top keys followed by OTHER, and sum in one bincount
+    date_codes, dates = pd.factorize(daily_data['download_date'], sort=True)
+    key_codes = pd.Index(top_keys).get_indexer(daily_data[key_column].astype(str))
+    key_codes[key_codes < 0] = len(top_keys)
+    
+    n_columns = len(top_keys) + 1
+    daily_totals = np.bincount(
+        date_codes * n_columns + key_codes,
+        weights=daily_data['total_bytes_downloaded'].to_numpy(dtype=np.float64),
+        minlength=len(dates) * n_columns
+    ).reshape(len(dates), n_columns).astype(np.int64)
+    
+    return dates, daily_totals
+
+def build_time_series(daily_data, key_column, top_keys):
+    """Build daily download totals for the top keys, folding every other key into OTHER"""
+    dates, daily_totals = build_time_series_matrix(daily_data, key_column, top_keys)
+    
+    # Split the matrix into plain per-day lists once, then build every dict in one pass;
+    # top keys are always present (0 when idle), OTHER only when non-zero
+    top_rows = daily_totals[:, :-1].tolist()
+    other_totals = daily_totals[:, -1].tolist()
+    
+    return [
+        {'date': date, **dict(zip(top_keys, top_row)), **({'OTHER': other} if other > 0 else {})}
+        for date, top_row, other in zip(dates.astype(str).tolist(), top_rows, other_totals)
+    ]
+
+def build_filter_clause(dataset_filter=None, start_date=None, end_date=None, region_code=None):
+    """Build a SQL WHERE clause and its parameters from the request filters"""
+    conditions = []
+    params = []
+    
+    if region_code is not None:
+        conditions.append('region_code = ?')
+        params.append(region_code)
+    
+    if dataset_filter and dataset_filter != 'ALL':
+        conditions.append('dandiset_id = ?')
+        params.append(dataset_filter)
+    
+    if start_date:
+        conditions.append('download_date >= ?')
+        params.append(pd.to_datetime(start_date).date())
+    
+    if end_date:
+        conditions.append('download_date <= ?')
+        params.append(pd.to_datetime(end_date).date())
+    
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where_clause, params
+
+def query_daily_totals(key_column, where_clause, params):
+    """Sum downloaded bytes per (date, key) directly from the parquet file"""
+    # Dates come back as ISO strings, matching the 'date' field of the time series
+    key_filter = f'{key_column} IS NOT NULL'
+    where_clause = f'{where_clause} AND {key_filter}' if where_clause else f'WHERE {key_filter}'
+    return get_duckdb_cursor().execute(f"""
+        SELECT
+            CAST(download_date AS VARCHAR) AS download_date,
+            {key_column},
+            CAST(SUM(total_bytes_downloaded) AS BIGINT) AS total_bytes_downloaded
+        FROM downloads
+        {where_clause}
+        GROUP BY 1, 2
+    """, params).df()
+
+def get_top_key_totals(daily_data, key_column):
+    """Get the top 7 keys by total bytes, largest first"""
+    top_totals = daily_data.groupby(key_column, observed=True, sort=False)['total_bytes_downloaded'].sum().nlargest(7).astype('int64')
+    return {str(k): v for k, v in top_totals.items()}
+
+def build_time_series_payload(daily_data, key_column):
+    """Build the time series, top keys and top key totals from per-(date, key) sums"""
+    key_totals_dict = get_top_key_totals(daily_data, key_column)
+    top_keys = list(key_totals_dict)
+    
+    return {
+        'time_series': build_time_series(daily_data, key_column, top_keys),
+        'top_datasets': top_keys,
+        'dataset_totals': key_totals_dict
+    }
+
+def build_time_series_arrow(daily_data, key_column, view_type):
+    """Serialize the time series as an Arrow IPC stream with one column per top key plus OTHER"""
+    key_totals_dict = get_top_key_totals(daily_data, key_column)
+    top_keys = list(key_totals_dict)
+    dates, daily_totals = build_time_series_matrix(daily_data, key_column, top_keys)
+    
+    columns = {'date': pa.array(dates.astype(str))}
+    for i, key in enumerate(top_keys + ['OTHER']):
+        columns[key] = daily_totals[:, i]
+    
+    # The non-tabular parts of the JSON payload travel as schema metadata
+    table = pa.table(columns).replace_schema_metadata({
+        'top_datasets': dumps_json(top_keys),
+        'dataset_totals': dumps_json(key_totals_dict),
+        'view_type': view_type
+    })
+    
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
 
 @app.route('/api/regions')
 def get_regions():
@@ -62,54 +312,47 @@ def get_regions():
     if df.empty:
         return jsonify([])
     
-    # Apply filters
-    filtered_df = df.copy()
-    
-    if dataset_filter and dataset_filter != 'ALL':
-        filtered_df = filtered_df[filtered_df['dandiset_id'] == dataset_filter]
-    
-    if start_date:
-        start_date_obj = pd.to_datetime(start_date).date()
-        filtered_df = filtered_df[filtered_df['download_date'] >= start_date_obj]
-    
-    if end_date:
-        end_date_obj = pd.to_datetime(end_date).date()
-        filtered_df = filtered_df[filtered_df['download_date'] <= end_date_obj]
-    
-    # Aggregate by region
-    region_stats = filtered_df.groupby(['region_code', 'latitude', 'longitude']).agg({
-        'total_bytes_downloaded': 'sum',
-        'dandiset_id': 'nunique'
-    }).reset_index()
-    
-    region_stats.columns = ['region_code', 'latitude', 'longitude', 'total_bytes', 'dataset_count']
-    
-    # Remove regions with no downloads
-    region_stats = region_stats[region_stats['total_bytes'] > 0]
-    
-    # Format output
-    regions = []
-    for _, row in region_stats.iterrows():
-        # Parse region code to get name and country
-        region_code = row['region_code']
-        if '/' in region_code:
-            country, name = region_code.split('/', 1)
-        else:
-            country = region_code
-            name = region_code
-        
-        regions.append({
-            'code': region_code,
-            'name': name,
-            'country': country,
-            'latitude': float(row['latitude']),
-            'longitude': float(row['longitude']),
-            'total_bytes': int(row['total_bytes']),
-            'total_bytes_formatted': format_bytes(row['total_bytes']),
-            'dataset_count': int(row['dataset_count'])
-        })
-    
-    return jsonify(regions)
+    return json_response(_compute_regions(_df_cache_timestamp, dataset_filter, start_date, end_date))
+
+@functools.lru_cache(maxsize=256)
+def _compute_regions(cache_timestamp, dataset_filter, start_date, end_date):
+    """Serialized region statistics, memoized per data load and filter combination"""
+    where_clause, params = build_filter_clause(dataset_filter, start_date, end_date)
+    
+    # Aggregate by region; rows without a region or coordinates are not mappable
+    where_clause = f'{where_clause} AND' if where_clause else 'WHERE'
+    region_stats = get_duckdb_cursor().execute(f"""
+        SELECT
+            region_code,
+            latitude,
+            longitude,
+            CAST(SUM(total_bytes_downloaded) AS BIGINT) AS total_bytes,
+            COUNT(DISTINCT dandiset_id) AS dataset_count
+        FROM downloads
+        {where_clause} region_code IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+        GROUP BY region_code, latitude, longitude
+        HAVING SUM(total_bytes_downloaded) > 0
+        ORDER BY region_code, latitude, longitude
+    """, params).df()
+    
+    if region_stats.empty:
+        return dumps_json([])
+    
+    # Parse region codes ("Country/Region") into country and name
+    parts = region_stats['region_code'].str.split('/', n=1, expand=True).reindex(columns=[0, 1])
+    
+    regions = pd.DataFrame({
+        'code': region_stats['region_code'],
+        'name': parts[1].fillna(region_stats['region_code']),
+        'country': parts[0],
+        'latitude': region_stats['latitude'],
+        'longitude': region_stats['longitude'],
+        'total_bytes': region_stats['total_bytes'].astype('int64'),
+        'total_bytes_formatted': format_bytes_array(region_stats['total_bytes'].to_numpy()),
+        'dataset_count': region_stats['dataset_count']
+    }).to_dict(orient='records')
+    
+    return dumps_json(regions)
 
 @app.route('/api/downloads/region/<path:region_code>')
 def get_region_downloads(region_code):
@@ -127,65 +370,19 @@ def get_region_downloads(region_code):
             'dataset_totals': {}
         })
     
-    # Filter by region
-    region_df = df[df['region_code'] == region_code].copy()
-    
-    if region_df.empty:
-        return jsonify({
-            'region_code': region_code,
-            'time_series': [],
-            'top_datasets': [],
-            'dataset_totals': {}
-        })
-    
-    # Apply dataset filter
-    if dataset_filter and dataset_filter != 'ALL':
-        region_df = region_df[region_df['dandiset_id'] == dataset_filter]
-    
-    # Apply date filters
-    if start_date:
-        start_date_obj = pd.to_datetime(start_date).date()
-        region_df = region_df[region_df['download_date'] >= start_date_obj]
-    
-    if end_date:
-        end_date_obj = pd.to_datetime(end_date).date()
-        region_df = region_df[region_df['download_date'] <= end_date_obj]
-    
-    # Get dataset totals for this region
-    dataset_totals = region_df.groupby('dandiset_id')['total_bytes_downloaded'].sum().sort_values(ascending=False)
-    
-    # Get top 7 datasets
-    top_datasets = [str(dataset_id) for dataset_id in dataset_totals.head(7).index]
-    dataset_totals_dict = {str(k): int(v) for k, v in dataset_totals.head(7).items()}
-    
-    # Create time series data
-    daily_data = region_df.groupby(['download_date', 'dandiset_id'])['total_bytes_downloaded'].sum().reset_index()
+    return json_response(_compute_region_downloads(_df_cache_timestamp, region_code, dataset_filter, start_date, end_date))
+
+@functools.lru_cache(maxsize=256)
+def _compute_region_downloads(cache_timestamp, region_code, dataset_filter, start_date, end_date):
+    """Serialized time series for one region, memoized per data load and filter combination"""
+    where_clause, params = build_filter_clause(dataset_filter, start_date, end_date, region_code=region_code)
     
-    # Pivot to get datasets as columns
-    time_series_pivot = daily_data.pivot(index='download_date', columns='dandiset_id', values='total_bytes_downloaded').fillna(0)
+    # Daily totals per dataset for this region
+    daily_data = query_daily_totals('dandiset_id', where_clause, params)
     
-    # Prepare time series output
-    time_series = []
-    for date, row in time_series_pivot.iterrows():
-        day_data = {'date': str(date)}
-        other_bytes = 0
-        
-        for dataset_id, bytes_sent in row.items():
-            if dataset_id in top_datasets:
-                day_data[dataset_id] = int(float(bytes_sent))
-            else:
-                other_bytes += int(float(bytes_sent))
-        
-        if other_bytes > 0:
-            day_data['OTHER'] = other_bytes
-        
-        time_series.append(day_data)
-    
-    return jsonify({
+    return dumps_json({
         'region_code': region_code,
-        'time_series': time_series,
-        'top_datasets': top_datasets,
-        'dataset_totals': dataset_totals_dict
+        **build_time_series_payload(daily_data, 'dandiset_id')
     })
 
 @app.route('/api/downloads/global')
@@ -203,152 +400,56 @@ def get_global_downloads():
             'dataset_totals': {}
         })
     
-    # Apply filters
-    filtered_df = df.copy()
+    # Numeric clients can ask for an Arrow stream; browsers get JSON
+    if request.accept_mimetypes.best_match(['application/json', ARROW_STREAM_MIMETYPE]) == ARROW_STREAM_MIMETYPE:
+        return Response(_compute_global_downloads_arrow(_df_cache_timestamp, dataset_filter, start_date, end_date),
+                        mimetype=ARROW_STREAM_MIMETYPE)
     
-    if dataset_filter and dataset_filter != 'ALL':
-        filtered_df = filtered_df[filtered_df['dandiset_id'] == dataset_filter]
-    
-    if start_date:
-        start_date_obj = pd.to_datetime(start_date).date()
-        filtered_df = filtered_df[filtered_df['download_date'] >= start_date_obj]
-    
-    if end_date:
-        end_date_obj = pd.to_datetime(end_date).date()
-        filtered_df = filtered_df[filtered_df['download_date'] <= end_date_obj]
+    return json_response(_compute_global_downloads(_df_cache_timestamp, dataset_filter, start_date, end_date))
+
+def query_global_daily_totals(dataset_filter, start_date, end_date):
+    """Per-(date, key) sums for the global view, with the key column and view type"""
+    where_clause, params = build_filter_clause(dataset_filter, start_date, end_date)
     
     # When a specific dataset is selected, show regions instead of datasets
     if dataset_filter and dataset_filter != 'ALL':
         # Aggregate by date and region for the selected dataset
-        daily_data = filtered_df.groupby(['download_date', 'region_code'])['total_bytes_downloaded'].sum().reset_index()
-        
-        # Get region totals for this dataset
-        region_totals = filtered_df.groupby('region_code')['total_bytes_downloaded'].sum().sort_values(ascending=False)
-        
-        # Get top 7 regions
-        top_regions = [str(region) for region in region_totals.head(7).index]
-        region_totals_dict = {str(k): int(v) for k, v in region_totals.head(7).items()}
-        
-        # Pivot to get regions as columns
-        time_series_pivot = daily_data.pivot(index='download_date', columns='region_code', values='total_bytes_downloaded').fillna(0)
-        
-        # Prepare time series output
-        time_series = []
-        for date, row in time_series_pivot.iterrows():
-            day_data = {'date': str(date)}
-            other_bytes = 0
-            
-            for region, bytes_sent in row.items():
-                region_str = str(region)
-                if region_str in top_regions:
-                    day_data[region_str] = int(float(bytes_sent))
-                else:
-                    other_bytes += int(float(bytes_sent))
-            
-            if other_bytes > 0:
-                day_data['OTHER'] = other_bytes
-            
-            time_series.append(day_data)
-
-        return jsonify({
-            'time_series': time_series,
-            'top_datasets': top_regions,  # Using 'top_datasets' for consistency, but contains regions
-            'dataset_totals': region_totals_dict,  # Using 'dataset_totals' for consistency, but contains region totals
-            'view_type': 'regions'  # Add indicator for frontend
-        })
-
-    else:
-        # Default behavior: show datasets across all regions
-        # Aggregate by date and dataset
-        daily_data = filtered_df.groupby(['download_date', 'dandiset_id'])['total_bytes_downloaded'].sum().reset_index()
-        
-        # Get dataset totals
-        dataset_totals = filtered_df.groupby('dandiset_id')['total_bytes_downloaded'].sum().sort_values(ascending=False)
-        
-        # Get top 7 datasets
-        top_datasets = [str(dataset_id) for dataset_id in dataset_totals.head(7).index]
-        dataset_totals_dict = {str(k): int(v) for k, v in dataset_totals.head(7).items()}
-
-        # print(f"Top datasets: {top_datasets}")
-        # print(f"Dataset totals: {dataset_totals_dict}")
+        return query_daily_totals('region_code', where_clause, params), 'region_code', 'regions'
+    
+    # Default behavior: show datasets across all regions
+    return query_daily_totals('dandiset_id', where_clause, params), 'dandiset_id', 'datasets'
 
-        # Pivot to get datasets as columns
-        time_series_pivot = daily_data.pivot(index='download_date', columns='dandiset_id', values='total_bytes_downloaded').fillna(0)
-        
-        # Prepare time series output
-        time_series = []
-        for date, row in time_series_pivot.iterrows():
-            day_data = {'date': str(date)}
-            other_bytes = 0
-            
-            for dataset_id, bytes_sent in row.items():
-                if dataset_id in top_datasets:
-                    day_data[dataset_id] = int(float(bytes_sent))
-                else:
-                    other_bytes += int(float(bytes_sent))
-            
-            if other_bytes > 0:
-                day_data['OTHER'] = other_bytes
-            
-            time_series.append(day_data)
+@functools.lru_cache(maxsize=256)
+def _compute_global_downloads(cache_timestamp, dataset_filter, start_date, end_date):
+    """Serialized global time series, memoized per data load and filter combination"""
+    daily_data, key_column, view_type = query_global_daily_totals(dataset_filter, start_date, end_date)
+    
+    # In the regions view 'top_datasets'/'dataset_totals' are kept for consistency, but contain regions
+    return dumps_json({
+        **build_time_series_payload(daily_data, key_column),
+        'view_type': view_type  # Add indicator for frontend
+    })
 
-        return jsonify({
-            'time_series': time_series,
-            'top_datasets': top_datasets,
-            'dataset_totals': dataset_totals_dict,
-            'view_type': 'datasets'  # Add indicator for frontend
-        })
+@functools.lru_cache(maxsize=256)
+def _compute_global_downloads_arrow(cache_timestamp, dataset_filter, start_date, end_date):
+    """Global time series as an Arrow IPC stream, memoized like the JSON variant"""
+    daily_data, key_column, view_type = query_global_daily_totals(dataset_filter, start_date, end_date)
+    return build_time_series_arrow(daily_data, key_column, view_type)
 
 @app.route('/api/datasets')
 def get_datasets():
     """Get list of all datasets"""
-    df = load_data()
-    if df.empty:
+    cache = load_data_cache()
+    if cache.df.empty:
         return jsonify([])
     
-    # Aggregate by dataset
-    dataset_stats = df.groupby('dandiset_id').agg({
-        'total_bytes_downloaded': 'sum',
-        'region_code': 'nunique',
-        'latitude': 'count'  # Use this as a proxy for records count
-    }).reset_index()
-    
-    # Count unique countries by parsing region codes
-    country_counts = []
-    for dataset_id in dataset_stats['dandiset_id']:
-        dataset_regions = df[df['dandiset_id'] == dataset_id]['region_code'].unique()
-        countries = set()
-        for region in dataset_regions:
-            if region is not None and '/' in region:
-                country = region.split('/')[0]
-                countries.add(country)
-            else:
-                countries.add(region)
-        country_counts.append(len(countries))
-    
-    dataset_stats['unique_countries'] = country_counts
-    dataset_stats.columns = ['id', 'total_bytes', 'unique_regions', 'record_count', 'unique_countries']
-    
-    # Sort by total bytes descending
-    dataset_stats = dataset_stats.sort_values('total_bytes', ascending=False)
-    
-    datasets = []
-    for _, row in dataset_stats.iterrows():
-        datasets.append({
-            'id': str(int(row['id'])).zfill(6),  # Zero-pad to 6 digits
-            'total_bytes': int(row['total_bytes']),
-            'total_bytes_formatted': format_bytes(row['total_bytes']),
-            'unique_regions': int(row['unique_regions']),
-            'unique_countries': int(row['unique_countries'])
-        })
-    
-    return jsonify(datasets)
+    return json_response(cache.datasets_json)
 
 @app.route('/api/stats')
 def get_stats():
     """Get overall statistics"""
-    df = load_data()
-    if df.empty:
+    cache = load_data_cache()
+    if cache.df.empty:
         return jsonify({
             'total_bytes': 0,
             'total_bytes_formatted': '0 B',
@@ -358,83 +459,133 @@ def get_stats():
             'active_regions': 0
         })
     
-    # Calculate overall statistics
-    total_bytes = int(df['total_bytes_downloaded'].sum())
-    total_datasets = int(df['dandiset_id'].nunique())
-    unique_regions = int(df['region_code'].nunique())
-    
-    # Count unique countries
-    countries = set()
-    for region in df['region_code'].unique():
-        if region is not None and '/' in region:
-            country = region.split('/')[0]
-            countries.add(country)
-        else:
-            countries.add(region)
-    unique_countries = len(countries)
-    
-    # Active regions are all regions with downloads
-    active_regions = unique_regions
-    
-    return jsonify({
-        'total_bytes': total_bytes,
-        'total_bytes_formatted': format_bytes(total_bytes),
-        'total_datasets': total_datasets,
-        'unique_regions': unique_regions,
-        'unique_countries': unique_countries,
-        'active_regions': active_regions
-    })
+    return json_response(cache.stats_json)
+
+# Shared HTTP session so DANDI API calls reuse pooled keep-alive connections
+_http = requests.Session()
+_http.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32,
+                                    max_retries=Retry(total=2, backoff_factor=0.2)))
 
 # Global cache for DANDI API data to avoid repeated calls
 _dandi_cache = None
+_dandi_etag = None
 _cache_timestamp = None
+_dandi_lock = threading.Lock()
+# Single worker so at most one refresh of the DANDI listing is in flight
+_dandi_executor = ThreadPoolExecutor(max_workers=1)
+_dandi_refresh_future = None
+
+# DANDI metadata is persisted here so restarts can revalidate instead of refetching
+DANDI_METADATA_PATH = 'data/dandi_metadata.json'
+
+def load_dandi_metadata_file():
+    """Load the persisted DANDI metadata and its ETag, if present"""
+    try:
+        with open(DANDI_METADATA_PATH, 'rb') as f:
+            persisted = orjson.loads(f.read())
+        return persisted.get('etag'), persisted.get('data')
+    except (OSError, orjson.JSONDecodeError):
+        return None, None
+
+def save_dandi_metadata_file(etag, data):
+    """Persist the DANDI metadata and its ETag for later processes"""
+    try:
+        with open(DANDI_METADATA_PATH, 'wb') as f:
+            f.write(orjson.dumps({'etag': etag, 'data': data}, option=orjson.OPT_NON_STR_KEYS))
+    except OSError as e:
+        print(f"Failed to persist DANDI metadata: {e}")
+
+def refresh_dandi_metadata():
+    """Fetch the DANDI dandiset listing and update the metadata cache"""
+    global _dandi_cache, _dandi_etag, _cache_timestamp
+    
+    current_time = datetime.now().timestamp()
+    
+    try:
+        api_url = "https://api.dandiarchive.org/api/dandisets/"
+        params = {
+            'page_size': 1000,
+            'ordering': '-created'
+        }
+        
+        # Revalidate the cached copy; an unchanged listing comes back as 304 with no body
+        headers = {}
+        if _dandi_cache is not None and _dandi_etag:
+            headers['If-None-Match'] = _dandi_etag
+        
+        response = _http.get(api_url, params=params, headers=headers, timeout=10)
+        
+        if response.status_code == 304:
+            _cache_timestamp = current_time
+            return
+        
+        response.raise_for_status()
+        
+        api_data = orjson.loads(response.content)
+        
+        # Create a mapping of dandiset IDs from the API
+        api_dandisets = {}
+        for dandiset in api_data.get('results', []):
+            dandiset_id = dandiset.get('identifier', '')
+            if dandiset_id:
+                # Get the most recent version
+                most_recent_version = dandiset.get('most_recent_published_version', {})
+                if not most_recent_version:
+                    most_recent_version = dandiset.get('draft_version', {})
+                
+                version = most_recent_version.get('version', 'draft')
+                
+                api_dandisets[dandiset_id] = {
+                    'name': most_recent_version.get('name', f'Dataset {dandiset_id}'),
+                    'version': version,
+                    'landing_url': f"https://dandiarchive.org/dandiset/{dandiset_id}/{version}"
+                }
+        
+        _dandi_cache = api_dandisets
+        _dandi_etag = response.headers.get('ETag')
+        _cache_timestamp = current_time
+        save_dandi_metadata_file(_dandi_etag, _dandi_cache)
+        
+    except Exception as e:
+        print(f"Failed to fetch DANDI metadata: {e}")
+        if _dandi_cache is None:
+            _dandi_cache = {}
+
+@functools.lru_cache(maxsize=1024)
+def fetch_dandiset_details(dataset_id, cache_timestamp):
+    """Fetch the DANDI API record for one dandiset, memoized until the metadata cache refreshes"""
+    api_url = f"https://api.dandiarchive.org/api/dandisets/{dataset_id}/"
+    response = _http.get(api_url, timeout=10)
+    
+    if response.status_code != 200:
+        return None
+    
+    return orjson.loads(response.content)
 
 def get_dandi_metadata():
     """Get DANDI metadata with caching"""
-    global _dandi_cache, _cache_timestamp
+    global _dandi_cache, _dandi_etag, _dandi_refresh_future
     
     # Cache for 1 hour
     cache_duration = 3600
-    current_time = datetime.now().timestamp()
     
-    if _dandi_cache is None or (_cache_timestamp is None) or (current_time - _cache_timestamp) > cache_duration:
-        try:
-            api_url = "https://api.dandiarchive.org/api/dandisets/"
-            params = {
-                'page_size': 1000,
-                'ordering': '-created'
-            }
-            
-            response = requests.get(api_url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            api_data = response.json()
-            
-            # Create a mapping of dandiset IDs from the API
-            api_dandisets = {}
-            for dandiset in api_data.get('results', []):
-                dandiset_id = dandiset.get('identifier', '')
-                if dandiset_id:
-                    # Get the most recent version
-                    most_recent_version = dandiset.get('most_recent_published_version', {})
-                    if not most_recent_version:
-                        most_recent_version = dandiset.get('draft_version', {})
-                    
-                    version = most_recent_version.get('version', 'draft')
-                    
-                    api_dandisets[dandiset_id] = {
-                        'name': most_recent_version.get('name', f'Dataset {dandiset_id}'),
-                        'version': version,
-                        'landing_url': f"https://dandiarchive.org/dandiset/{dandiset_id}/{version}"
-                    }
-            
-            _dandi_cache = api_dandisets
-            _cache_timestamp = current_time
-            
-        except Exception as e:
-            print(f"Failed to fetch DANDI metadata: {e}")
-            if _dandi_cache is None:
-                _dandi_cache = {}
+    def is_fresh():
+        current_time = datetime.now().timestamp()
+        return _dandi_cache is not None and _cache_timestamp is not None and (current_time - _cache_timestamp) <= cache_duration
+    
+    if is_fresh():
+        return _dandi_cache
+    
+    with _dandi_lock:
+        if _dandi_cache is None:
+            _dandi_etag, _dandi_cache = load_dandi_metadata_file()
+        
+        if _dandi_cache is None:
+            # Nothing to serve yet, so the first load is synchronous
+            refresh_dandi_metadata()
+        elif not is_fresh() and (_dandi_refresh_future is None or _dandi_refresh_future.done()):
+            # Serve the stale copy while a single background refresh runs
+            _dandi_refresh_future = _dandi_executor.submit(refresh_dandi_metadata)
     
     return _dandi_cache
 
@@ -442,15 +593,15 @@ def get_dandi_metadata():
 def get_featured_dandisets():
     """Get featured dandisets - the top datasets shown in the global bar plot"""
     try:
-        df = load_data()
-        if df.empty:
+        cache = load_data_cache()
+        if cache.df.empty:
             return jsonify({
                 'featured_dandisets': [],
                 'count': 0
             })
         
         # Get the top datasets by download volume
-        dataset_totals = df.groupby('dandiset_id')['total_bytes_downloaded'].sum().sort_values(ascending=False).head(7)
+        dataset_totals = cache.featured_totals
         
         # Get DANDI metadata
         dandi_metadata = get_dandi_metadata()
@@ -568,16 +719,7 @@ def get_dataset_details(dataset_id):
         # Calculate statistics
         total_bytes = int(dataset_df['total_bytes_downloaded'].sum())
         unique_regions = int(dataset_df['region_code'].nunique())
-        
-        # Count unique countries
-        countries = set()
-        for region in dataset_df['region_code'].unique():
-            if region is not None and '/' in region:
-                country = region.split('/')[0]
-                countries.add(country)
-            elif region is not None:
-                countries.add(region)
-        unique_countries = len(countries)
+        unique_countries = int(dataset_df['country'].nunique())
         
         # Get DANDI metadata
         dandi_metadata = get_dandi_metadata()
@@ -608,12 +750,9 @@ def get_dataset_details(dataset_id):
         
         # Try to get additional metadata from DANDI API for this specific dataset
         try:
-            api_url = f"https://api.dandiarchive.org/api/dandisets/{dataset_id}/"
-            response = requests.get(api_url, timeout=10)
+            api_data = fetch_dandiset_details(dataset_id, _cache_timestamp)
             
-            if response.status_code == 200:
-                api_data = response.json()
-                
+            if api_data is not None:
                 # Get the most recent version for detailed info
                 most_recent_version = api_data.get('most_recent_published_version', {})
                 if not most_recent_version:
@@ -663,5 +802,9 @@ def get_dataset_details(dataset_id):
             'error': f'Failed to fetch dataset details: {str(e)}'
         }), 500
 
+# Load the data at import so `gunicorn --preload` forks workers that share it copy-on-write
+load_data_cache()
+
 if __name__ == '__main__':
+    # Development server only; see the Procfile for the production gunicorn command
     app.run(debug=True, host='0.0.0.0', port=5001)
@@ -21,21 +21,20 @@ def calculate_zarr_percentage():
     conn = duckdb.connect(db_path)
     
     try:
-        # Get total count of assets
-        total_result = conn.execute("SELECT COUNT(*) FROM assets").fetchone()
-        total_assets = total_result[0] if total_result else 0
+        # Count every asset type in a single scan
+        counts = dict(conn.execute("""
+            SELECT asset_type, COUNT(*) as count 
+            FROM assets 
+            GROUP BY asset_type
+        """).fetchall())
+        total_assets = sum(counts.values())
         
         if total_assets == 0:
             print("No assets found in the database.")
             return
         
-        # Get count of zarr assets
-        zarr_result = conn.execute("SELECT COUNT(*) FROM assets WHERE asset_type = 'zarr'").fetchone()
-        zarr_assets = zarr_result[0] if zarr_result else 0
-        
-        # Get count of blob assets
-        blob_result = conn.execute("SELECT COUNT(*) FROM assets WHERE asset_type = 'blob'").fetchone()
-        blob_assets = blob_result[0] if blob_result else 0
+        zarr_assets = counts.get('zarr', 0)
+        blob_assets = counts.get('blob', 0)
         
         # Calculate percentage
         zarr_percentage = (zarr_assets / total_assets) * 100 if total_assets > 0 else 0
@@ -52,12 +51,8 @@ def calculate_zarr_percentage():
         print(f"Percentage of assets that are blob: {blob_percentage:.2f}%")
         
         # Check for any other asset types
-        other_result = conn.execute("""
-            SELECT asset_type, COUNT(*) as count 
-            FROM assets 
-            WHERE asset_type NOT IN ('zarr', 'blob')
-            GROUP BY asset_type
-        """).fetchall()
+        other_result = [(asset_type, count) for asset_type, count in counts.items()
+                        if asset_type is not None and asset_type not in ('zarr', 'blob')]
         
         if other_result:
             print("\nOther asset types found:")
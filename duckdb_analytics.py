@@ -6,28 +6,169 @@ No need to ingest the large parquet file - query it directly!
 import duckdb
 import yaml
 import pandas as pd
-import pathlib
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from pathlib import Path
 from typing import Optional, Dict, List
 import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from dandi.dandiapi import DandiAPIClient
 from tqdm import tqdm
 
+from known_regions import resolve_regions
+
+# Prefer the libyaml-backed loader; the pure-Python one is several times slower on the large mapping files
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Number of buffered asset rows written per bulk insert in build_asset_mappings
+ASSET_FLUSH_ROWS = 10_000
+
+# Concurrent DANDI API requests in build_asset_mappings
+DANDI_FETCH_WORKERS = 16
+
+# Seconds between progress log lines in build_asset_mappings
+PROGRESS_LOG_INTERVAL = 60
+
+
+def convert_coordinates_yaml_to_parquet(yaml_path: str, parquet_path: Optional[str] = None) -> Path:
+    """Convert the region coordinates YAML to a (region_code, latitude, longitude) parquet file."""
+    yaml_file = Path(yaml_path)
+    parquet_file = Path(parquet_path) if parquet_path else yaml_file.with_suffix('.parquet')
+    
+    with open(yaml_file, 'r') as f:
+        coordinates_data = yaml.load(f, Loader=YamlLoader)
+    
+    coordinate_rows = {}
+    for region_code, coords in coordinates_data.items():
+        try:
+            # Handle None coordinates for special regions like GitHub, VPN, unknown
+            if coords.get('latitude') is None or coords.get('longitude') is None:
+                continue
+            
+            coordinate_rows[region_code] = (float(coords['latitude']), float(coords['longitude']))
+        
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Error processing coordinates for {region_code}: {e}")
+            continue
+        except Exception as e:
+            logger.warning(f"Unexpected error processing coordinates for {region_code}: {e}")
+            continue
+    
+    pq.write_table(pa.table({
+        "region_code": pa.array(list(coordinate_rows), type=pa.string()),
+        "latitude": pa.array([c[0] for c in coordinate_rows.values()], type=pa.float64()),
+        "longitude": pa.array([c[1] for c in coordinate_rows.values()], type=pa.float64())
+    }), parquet_file)
+    
+    logger.info(f"Wrote {len(coordinate_rows):,} region coordinates to {parquet_file}")
+    return parquet_file
+
+
+def is_zarr_path(asset_path: str) -> bool:
+    """Whether ".zarr" is among a (normalized) asset path's suffixes, matching pathlib without building a Path."""
+    name = asset_path.rstrip('/').rpartition('/')[2]
+    if name.endswith('.'):
+        return False
+    return 'zarr' in name.lstrip('.').split('.')[1:]
+
+
+def fetch_version_assets(client: DandiAPIClient, dandiset_id: str, version_id: str):
+    """Fetch a version's title and (blob_id, path, size, type) asset rows from the DANDI API."""
+    # Get full dandiset object for this version
+    versioned_dandiset = client.get_dandiset(
+        dandiset_id=dandiset_id, 
+        version_id=version_id
+    )
+    
+    # Get dandiset metadata
+    title = getattr(versioned_dandiset, 'name', None)
+    
+    asset_rows = []
+    for asset in versioned_dandiset.get_assets():
+        try:
+            # Determine blob ID and asset type
+            asset_path = asset.path
+            asset_size = getattr(asset, 'size', None)
+            
+            if is_zarr_path(asset_path):
+                # For zarr assets, try to get zarr attribute, fallback to identifier
+                blob_id = asset.zarr
+                asset_type = "zarr"
+            else:
+                # For blob assets, get blob attribute - let it error if missing
+                blob_id = asset.blob
+                asset_type = "blob"
+            
+            asset_rows.append((blob_id, asset_path, asset_size, asset_type))
+            
+        except Exception as e:
+            logger.warning(f"Error processing asset {asset.path} in {dandiset_id}/{version_id}: {e}")
+            continue
+    
+    return title, asset_rows
+
+
+def load_yaml_mapping(yaml_path: str) -> pa.Table:
+    """
+    Load a flat YAML mapping as a (key, value) string table.
+    
+    Parsing the large mapping files dominates loading, so the parsed mapping is cached
+    in a parquet file next to the YAML and read from there (multithreaded, no Python
+    per row) until the YAML changes.
+    """
+    yaml_file = Path(yaml_path)
+    cache_file = yaml_file.with_suffix('.parquet')
+    
+    if cache_file.exists() and cache_file.stat().st_mtime >= yaml_file.stat().st_mtime:
+        return pq.read_table(cache_file)
+    
+    with open(yaml_file, 'r') as f:
+        mapping = yaml.load(f, Loader=YamlLoader)
+    
+    # YAML may parse a value as a number or bool; coerce so one odd entry cannot fail the whole load
+    table = pa.table({
+        "key": pa.array([str(k) for k in mapping.keys()], type=pa.string()),
+        "value": pa.array([None if v is None else str(v) for v in mapping.values()], type=pa.string())
+    })
+    
+    try:
+        pq.write_table(table, cache_file)
+    except OSError as e:
+        logger.warning(f"Could not cache {yaml_path} as parquet: {e}")
+    
+    return table
+
 
 class DuckDBAnalytics:
     """DuckDB-based analytics that queries parquet files directly."""
     
     def __init__(self, 
                  db_path: str = "analytics.duckdb",
-                 parquet_path: str = "database.parquet"):
-        """Initialize DuckDB connection and setup."""
+                 parquet_path: str = "database.parquet",
+                 threads: Optional[int] = None):
+        """Initialize DuckDB connection and setup.
+        
+        threads defaults to the number of CPUs this process may run on, which
+        can be fewer than the machine has when the process is pinned to a subset.
+        """
         self.db_path = db_path
         self.parquet_path = parquet_path
         self.conn = duckdb.connect(db_path)
+        if threads is None:
+            threads = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+        self.conn.execute("SET threads = ?", [threads])
         self._setup_schema()
     
     def _setup_schema(self):
@@ -108,139 +249,109 @@ class DuckDBAnalytics:
             )
         """)
         
+        # Create metadata table (e.g. which parquet the materialized tables were built from)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS _meta (
+                key VARCHAR PRIMARY KEY,
+                value VARCHAR
+            )
+        """)
+        
         logger.info("Schema setup complete")
     
     def load_blob_mapping(self, yaml_path: str = "blob_index_to_id.yaml"):
         """Load blob index to ID mapping from YAML file."""
         logger.info(f"Loading blob mapping from {yaml_path}")
         
-        with open(yaml_path, 'r') as f:
-            blob_mapping = yaml.safe_load(f)
+        blob_mapping = load_yaml_mapping(yaml_path)
         
-        # Convert to DataFrame and insert
-        blob_data = [{"blob_index": int(k), "blob_id": v} for k, v in blob_mapping.items()]
-        blob_df = pd.DataFrame(blob_data)
+        # Build the columns directly as arrays (no per-row dicts) so DuckDB can scan them as Arrow buffers
+        blob_table = pa.table({
+            "blob_index": pc.cast(blob_mapping["key"], pa.int64()),
+            "blob_id": blob_mapping["value"]
+        })
         
         # Clear existing data and insert new
         self.conn.execute("DELETE FROM blob_mapping")
-        self.conn.register('blob_df_temp', blob_df)
-        self.conn.execute("""
-            INSERT INTO blob_mapping SELECT * FROM blob_df_temp
-        """)
-        self.conn.execute("DROP VIEW blob_df_temp")
+        self.conn.from_arrow(blob_table).insert_into('blob_mapping')
         
-        logger.info(f"Loaded {len(blob_data):,} blob mappings")
+        logger.info(f"Loaded {blob_table.num_rows:,} blob mappings")
     
     def load_ip_region_mapping(self, yaml_path: str = "index_to_region.yaml", 
-                              coordinates_path: str = "region_codes_to_coordinates.yaml"):
-        """Load IP index to region mapping from YAML file and update with coordinates."""
+                              coordinates_path: str = "region_codes_to_coordinates.yaml",
+                              resolve_coordinates: bool = False):
+        """
+        Load IP index to region mapping from YAML file and update with coordinates (YAML or parquet).
+        
+        With resolve_coordinates, regions the coordinates file leaves without coordinates are
+        then resolved through resolve_region_coordinates, which may call the OpenCage API.
+        """
         logger.info(f"Loading IP region mapping from {yaml_path}")
         
-        with open(yaml_path, 'r') as f:
-            ip_region_mapping = yaml.safe_load(f)
+        ip_region_mapping = load_yaml_mapping(yaml_path)
         
-        logger.info(f"Processing {len(ip_region_mapping):,} IP region mappings")
+        logger.info(f"Processing {ip_region_mapping.num_rows:,} IP region mappings")
         
-        regions_added = 0
-        mappings_added = 0
+        # Split the region codes and map the IPs in SQL straight from the Arrow table (DuckDB
+        # scans local Arrow tables by variable name, no view needed); keys that are not valid
+        # IP indexes are reported and skipped
+        for (indexed_ip_str,) in self.conn.execute("""
+            SELECT key FROM ip_region_mapping WHERE TRY_CAST(key AS UBIGINT) IS NULL
+        """).fetchall():
+            logger.warning(f"Invalid IP index: {indexed_ip_str}")
         
-        for indexed_ip_str, region_code in ip_region_mapping.items():
-            try:
-                indexed_ip = int(indexed_ip_str)
-                
-                # Parse region code to extract components
-                country = None
-                region = None
-                provider = None
-                
-                if '/' in region_code:
-                    # Format: "Country/Region" or "Provider/Region"
-                    parts = region_code.split('/', 1)
-                    first_part = parts[0].strip()
-                    second_part = parts[1].strip()
-                    
-                    # Determine if first part is a cloud provider or country
-                    if first_part in ['AWS', 'GCP', 'Azure']:
-                        provider = first_part
-                        region = second_part
-                    else:
-                        country = first_part
-                        region = second_part
-                else:
-                    # Single value (e.g., "GitHub", "VPN", "unknown")
-                    provider = region_code.strip()
-                
-                # Insert or get region
-                try:
-                    # First try to get existing region
-                    result = self.conn.execute("""
-                        SELECT region_code FROM regions 
-                        WHERE region_code = ?
-                    """, (region_code,)).fetchone()
-                    
-                    if not result:
-                        # Insert new region
-                        self.conn.execute("""
-                            INSERT INTO regions (region_code, country, region, provider)
-                            VALUES (?, ?, ?, ?)
-                        """, (region_code, country, region, provider))
-                        regions_added += 1
-                    
-                    # Map IP to region
-                    self.conn.execute("""
-                        INSERT OR REPLACE INTO ip_regions (indexed_ip, region_code)
-                        VALUES (?, ?)
-                    """, (indexed_ip, region_code))
-                    mappings_added += 1
-                
-                except Exception as e:
-                    logger.warning(f"Error processing region mapping {indexed_ip}: {region_code} - {e}")
-                    continue
-                    
-            except ValueError:
-                logger.warning(f"Invalid IP index: {indexed_ip_str}")
-                continue
-            except Exception as e:
-                logger.warning(f"Error processing mapping {indexed_ip_str}: {region_code} - {e}")
-                continue
+        # Insert regions not already present, parsing "Country/Region", "Provider/Region"
+        # or a single value (e.g. "GitHub", "VPN", "unknown") into their components
+        regions_added = self.conn.execute("""
+            INSERT INTO regions (region_code, country, region, provider)
+            SELECT 
+                region_code,
+                CASE WHEN has_slash AND first_part NOT IN ('AWS', 'GCP', 'Azure') THEN first_part END,
+                CASE WHEN has_slash THEN trim(second_part) END,
+                CASE WHEN NOT has_slash THEN trim(region_code)
+                     WHEN first_part IN ('AWS', 'GCP', 'Azure') THEN first_part END
+            FROM (
+                SELECT DISTINCT
+                    value AS region_code,
+                    position('/' IN value) > 0 AS has_slash,
+                    trim(split_part(value, '/', 1)) AS first_part,
+                    substr(value, position('/' IN value) + 1) AS second_part
+                FROM ip_region_mapping
+                WHERE TRY_CAST(key AS UBIGINT) IS NOT NULL AND value IS NOT NULL
+            )
+            WHERE region_code NOT IN (SELECT region_code FROM regions)
+        """).fetchone()[0]
+        
+        # Map every IP to its region
+        mappings_added = self.conn.execute("""
+            INSERT OR REPLACE INTO ip_regions (indexed_ip, region_code)
+            SELECT TRY_CAST(key AS UBIGINT), value FROM ip_region_mapping
+            WHERE TRY_CAST(key AS UBIGINT) IS NOT NULL AND value IS NOT NULL
+        """).fetchone()[0]
         
         logger.info(f"IP region mapping completed:")
         logger.info(f"  Regions processed: {regions_added:,}")
         logger.info(f"  IP mappings added: {mappings_added:,}")
         
-        # Now load and apply coordinates
+        # Now apply coordinates, joined straight from parquet
         logger.info(f"Loading coordinates from {coordinates_path}")
         try:
-            with open(coordinates_path, 'r') as f:
-                coordinates_data = yaml.safe_load(f)
+            coordinates_file = Path(coordinates_path)
+            if coordinates_file.suffix != '.parquet':
+                # Convert the YAML once; reuse the parquet until the YAML changes
+                parquet_file = coordinates_file.with_suffix('.parquet')
+                if not parquet_file.exists() or parquet_file.stat().st_mtime < coordinates_file.stat().st_mtime:
+                    convert_coordinates_yaml_to_parquet(coordinates_file, parquet_file)
+                coordinates_file = parquet_file
+            elif not coordinates_file.exists():
+                raise FileNotFoundError(coordinates_path)
             
-            coordinates_updated = 0
-            
-            for region_code, coords in coordinates_data.items():
-                try:
-                    # Handle None coordinates for special regions like GitHub, VPN, unknown
-                    if coords.get('latitude') is None or coords.get('longitude') is None:
-                        continue
-                    
-                    latitude = float(coords['latitude'])
-                    longitude = float(coords['longitude'])
-                    
-                    # Update region with coordinates
-                    result = self.conn.execute("""
-                        UPDATE regions 
-                        SET latitude = ?, longitude = ?
-                        WHERE region_code = ?
-                    """, (latitude, longitude, region_code))
-                    
-                    if self.conn.rowcount > 0:
-                        coordinates_updated += 1
-                
-                except (ValueError, TypeError, KeyError) as e:
-                    logger.warning(f"Error processing coordinates for {region_code}: {e}")
-                    continue
-                except Exception as e:
-                    logger.warning(f"Unexpected error processing coordinates for {region_code}: {e}")
-                    continue
+            coordinates_updated = self.conn.execute("""
+                UPDATE regions 
+                SET latitude = c.latitude, longitude = c.longitude
+                FROM read_parquet(?) c
+                WHERE regions.region_code = c.region_code
+            """, (str(coordinates_file),)).fetchone()[0]
             
             logger.info(f"Coordinates update completed:")
             logger.info(f"  Regions updated with coordinates: {coordinates_updated:,}")
@@ -249,6 +360,30 @@ class DuckDBAnalytics:
             logger.warning(f"Coordinates file not found: {coordinates_path}")
         except Exception as e:
             logger.warning(f"Error loading coordinates file: {e}")
+        
+        if resolve_coordinates:
+            self.resolve_region_coordinates()
+    
+    def resolve_region_coordinates(self):
+        """Fill in coordinates for regions that have none, via the region cache and OpenCage."""
+        missing = [row[0] for row in self.conn.execute(
+            "SELECT region_code FROM regions WHERE latitude IS NULL OR longitude IS NULL"
+        ).fetchall()]
+        if not missing:
+            return
+        
+        logger.info(f"Resolving coordinates for {len(missing):,} regions")
+        resolved = resolve_regions(missing, conn=self.conn)
+        updates = [
+            (coordinates["latitude"], coordinates["longitude"], region_code)
+            for region_code, coordinates in resolved.items()
+            if coordinates["latitude"] is not None and coordinates["longitude"] is not None
+        ]
+        if updates:
+            self.conn.executemany(
+                "UPDATE regions SET latitude = ?, longitude = ? WHERE region_code = ?", updates
+            )
+        logger.info(f"  Regions resolved with coordinates: {len(updates):,}")
     
     def build_asset_mappings(self, incremental: bool = True, clear_existing: bool = False):
         """Build asset mappings from DANDI API with incremental updates."""
@@ -279,135 +414,127 @@ class DuckDBAnalytics:
         total_skipped = 0
         total_processed = 0
         
-        # Process each dandiset
-        for dandiset in tqdm(dandisets, desc="Processing dandisets", position=0):
-            dandiset_id = dandiset.identifier
+        # Rows are buffered in Python and written in bulk by _flush_asset_rows
+        pending_dandisets = {}
+        pending_versions = []
+        pending_assets = {}
+        pending_mappings = {}
+        
+        with self._transaction(), ThreadPoolExecutor(max_workers=DANDI_FETCH_WORKERS) as executor:
+            # Fetch the version lists of all dandisets concurrently
+            version_futures = {}
+            for dandiset in dandisets:
+                dandiset_id = dandiset.identifier
+                
+                # Skip problematic dandisets
+                if dandiset_id in ["000571", "000773"]:
+                    logger.info(f"Skipping dandiset {dandiset_id} (too many assets)")
+                    continue
+                
+                version_futures[dandiset_id] = executor.submit(lambda d=dandiset: list(d.get_versions()))
             
-            # Skip problematic dandisets
-            if dandiset_id in ["000571", "000773"]:
-                logger.info(f"Skipping dandiset {dandiset_id} (too many assets)")
-                continue
+            # Decide which versions need processing, against one up-front read of the processed versions
+            processed_versions = {}
+            if incremental:
+                # processed_at is stored in the session time zone; read it back as epoch seconds
+                processed_versions = {
+                    (dandiset_id, version_id): processed_at
+                    for dandiset_id, version_id, processed_at in self.conn.execute("""
+                        SELECT dandiset_id, version_id, epoch(CAST(processed_at AS TIMESTAMPTZ)) FROM dandiset_versions 
+                        WHERE processed_at IS NOT NULL
+                    """).fetchall()
+                }
             
-            try:
-                # Get all versions for this dandiset
-                versions = list(dandiset.get_versions())
-                
-                for version in tqdm(versions, desc=f"Versions for {dandiset_id}", 
-                                  position=1, leave=False):
-                    version_id = version.identifier
+            versions_to_process = []
+            for dandiset_id, future in version_futures.items():
+                try:
+                    versions = future.result()
                     
-                    # Skip if already processed and not updated (in incremental mode)
-                    if incremental:
-                        # Check if version was already processed
-                        result = self.conn.execute("""
-                            SELECT processed_at FROM dandiset_versions 
-                            WHERE dandiset_id = ? AND version_id = ? AND processed_at IS NOT NULL
-                        """, (dandiset_id, version_id)).fetchone()
+                    for version in versions:
+                        version_id = version.identifier
                         
-                        if result:
-                            processed_at = result[0]
+                        # Skip if already processed and not updated (in incremental mode)
+                        if incremental:
+                            # Check if version was already processed
+                            processed_at = processed_versions.get((dandiset_id, version_id))
                             
-                            # Get version's modified date to check if it's been updated
-                            version_modified = getattr(version, 'modified', None)
-                            if version_modified and processed_at:
-                                # Convert timestamps for comparison if needed
-                                if isinstance(version_modified, str):
-                                    version_modified = datetime.fromisoformat(version_modified.replace('Z', '+00:00'))
-                                if isinstance(processed_at, str):
-                                    processed_at = datetime.fromisoformat(processed_at)
-                                
-                                # Skip if version hasn't been modified since we processed it
-                                if version_modified <= processed_at:
-                                    total_skipped += 1
-                                    continue
-                                else:
-                                    logger.info(f"Dandiset {dandiset_id}/{version_id} updated since last processed - reprocessing")
+                            if processed_at is not None:
+                                # Get version's modified date to check if it's been updated
+                                version_modified = getattr(version, 'modified', None)
+                                if version_modified:
+                                    # Convert to epoch seconds, which also avoids naive/aware datetime comparisons
+                                    if isinstance(version_modified, str):
+                                        version_modified = datetime.fromisoformat(version_modified.replace('Z', '+00:00'))
+                                    
+                                    # Skip if version hasn't been modified since we processed it
+                                    if version_modified.timestamp() <= processed_at:
+                                        total_skipped += 1
+                                        continue
+                                    else:
+                                        logger.info(f"Dandiset {dandiset_id}/{version_id} updated since last processed - reprocessing")
+                        
+                        total_processed += 1
+                        versions_to_process.append((dandiset_id, version_id))
+                
+                except Exception as e:
+                    logger.warning(f"Error processing dandiset {dandiset_id}: {e}")
+                    continue
+            
+            # Fetch version assets in worker threads, keeping a bounded number in flight, and
+            # write them on this thread in submission order so later versions still win
+            asset_futures = deque()
+            pending_fetches = iter(versions_to_process)
+            assets_fetched = 0
+            dandisets_fetched = set()
+            last_progress_log = time.monotonic()
+            
+            with tqdm(total=len(versions_to_process), desc="Processing versions") as progress:
+                while True:
+                    for dandiset_id, version_id in pending_fetches:
+                        asset_futures.append((dandiset_id, version_id, executor.submit(
+                            fetch_version_assets, client, dandiset_id, version_id)))
+                        if len(asset_futures) >= DANDI_FETCH_WORKERS * 2:
+                            break
                     
-                    total_processed += 1
+                    if not asset_futures:
+                        break
+                    
+                    dandiset_id, version_id, future = asset_futures.popleft()
+                    progress.update()
                     
                     try:
-                        # Get full dandiset object for this version
-                        versioned_dandiset = client.get_dandiset(
-                            dandiset_id=dandiset_id, 
-                            version_id=version_id
-                        )
-                        
-                        # Get dandiset metadata
-                        title = getattr(versioned_dandiset, 'name', None)
-                        
-                        # Insert dandiset metadata
-                        self.conn.execute("""
-                            INSERT OR REPLACE INTO dandisets 
-                            (identifier, name, created_at, updated_at)
-                            VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                        """, (dandiset_id, title))
-                        
-                        # Insert version record BEFORE processing assets (to satisfy foreign key constraint)
-                        self.conn.execute("""
-                            INSERT OR REPLACE INTO dandiset_versions 
-                            (dandiset_id, version_id, processed_at)
-                            VALUES (?, ?, NULL)
-                        """, (dandiset_id, version_id))
-                        
-                        # Process all assets in this version
-                        assets = list(versioned_dandiset.get_assets())
+                        title, asset_rows = future.result()
                         
-                        for asset in tqdm(assets, desc=f"Assets in {dandiset_id}/{version_id}", 
-                                        position=2, leave=False):
-                            try:
-                                # Determine blob ID and asset type
-                                asset_path = asset.path
-                                asset_size = getattr(asset, 'size', None)
-                                is_zarr = ".zarr" in pathlib.Path(asset_path).suffixes
-                                
-                                if is_zarr:
-                                    # For zarr assets, try to get zarr attribute, fallback to identifier
-                                    blob_id = asset.zarr
-                                    asset_type = "zarr"
-                                else:
-                                    # For blob assets, get blob attribute - let it error if missing
-                                    blob_id = asset.blob
-                                    asset_type = "blob"
-                                
-                                # Insert asset
-                                self.conn.execute("""
-                                    INSERT OR REPLACE INTO assets 
-                                    (blob_id, asset_path, asset_size, asset_type, created_at)
-                                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-                                """, (blob_id, asset_path, asset_size, asset_type))
-                                
-                                # Insert mapping
-                                self.conn.execute("""
-                                    INSERT OR REPLACE INTO asset_dandiset_mappings 
-                                    (blob_id, dandiset_id, version_id)
-                                    VALUES (?, ?, ?)
-                                """, (blob_id, dandiset_id, version_id))
-                                
-                            except Exception as e:
-                                logger.warning(f"Error processing asset {asset.path} in {dandiset_id}/{version_id}: {e}")
-                                continue
+                        # Buffer dandiset metadata
+                        pending_dandisets[dandiset_id] = title
                         
-                        # Insert version record with processed timestamp (more efficient than separate UPDATE)
-                        self.conn.execute("""
-                            INSERT OR REPLACE INTO dandiset_versions 
-                            (dandiset_id, version_id, processed_at)
-                            VALUES (?, ?, CURRENT_TIMESTAMP)
-                        """, (dandiset_id, version_id))
+                        # Buffer assets and mappings (later rows for the same blob win, as with INSERT OR REPLACE)
+                        for blob_id, asset_path, asset_size, asset_type in asset_rows:
+                            pending_assets[blob_id] = (asset_path, asset_size, asset_type)
+                            pending_mappings[blob_id] = (dandiset_id, version_id)
                         
+                        # The version is marked processed in the same commit that writes its assets
+                        pending_versions.append((dandiset_id, version_id))
+
                     except Exception as e:
                         logger.warning(f"Error processing version {version_id} of dandiset {dandiset_id}: {e}")
                         continue
-                
-            except Exception as e:
-                logger.warning(f"Error processing dandiset {dandiset_id}: {e}")
-                continue
+
+                    # A failed write is not a version error: let it propagate so the transaction rolls back
+                    if len(pending_assets) >= ASSET_FLUSH_ROWS:
+                        self._flush_asset_rows(pending_dandisets, pending_versions, pending_assets, pending_mappings)
+
+                    assets_fetched += len(asset_rows)
+                    dandisets_fetched.add(dandiset_id)
+                    
+                    # Log progress periodically, from counters kept here rather than COUNT(*) queries
+                    if time.monotonic() - last_progress_log >= PROGRESS_LOG_INTERVAL:
+                        last_progress_log = time.monotonic()
+                        logger.info(f"Progress: {assets_fetched:,} assets, "
+                                   f"{len(dandisets_fetched):,} dandisets fetched this run, "
+                                   f"Processed: {total_processed:,}, Skipped: {total_skipped:,}")
             
-            # Log progress periodically
-            if int(dandiset_id) % 10 == 0:
-                stats = self.get_asset_stats()
-                logger.info(f"Progress: {stats['total_assets']:,} assets, "
-                           f"{stats['total_dandisets']:,} dandisets, "
-                           f"Processed: {total_processed:,}, Skipped: {total_skipped:,}")
+            self._flush_asset_rows(pending_dandisets, pending_versions, pending_assets, pending_mappings)
         
         # Final statistics
         logger.info("Asset mapping build completed!")
@@ -422,6 +549,71 @@ class DuckDBAnalytics:
             efficiency = (total_skipped / (total_skipped + total_processed)) * 100
             logger.info(f"  Efficiency: {efficiency:.1f}% versions skipped")
     
+    def _flush_asset_rows(self, pending_dandisets: Dict, pending_versions: List,
+                          pending_assets: Dict, pending_mappings: Dict):
+        """Write buffered dandisets, processed versions, assets and mappings in bulk, clear the buffers and commit."""
+        # Dandisets and versions go first to satisfy the mappings' foreign keys; since everything
+        # commits together, an interrupted run never sees a processed version without its assets
+        if pending_dandisets:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO dandisets 
+                (identifier, name, created_at, updated_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            """, list(pending_dandisets.items()))
+        
+        if pending_versions:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO dandiset_versions 
+                (dandiset_id, version_id, processed_at)
+                VALUES (?, ?, CURRENT_TIMESTAMP)
+            """, pending_versions)
+        
+        if pending_assets:
+            assets_table = pa.table({
+                "blob_id": pa.array(list(pending_assets), type=pa.string()),
+                "asset_path": pa.array([a[0] for a in pending_assets.values()], type=pa.string()),
+                "asset_size": pa.array([a[1] for a in pending_assets.values()], type=pa.uint64()),
+                "asset_type": pa.array([a[2] for a in pending_assets.values()], type=pa.string())
+            })
+            mappings_table = pa.table({
+                "blob_id": pa.array(list(pending_mappings), type=pa.string()),
+                "dandiset_id": pa.array([m[0] for m in pending_mappings.values()], type=pa.string()),
+                "version_id": pa.array([m[1] for m in pending_mappings.values()], type=pa.string())
+            })
+            
+            # Both tables are scanned by variable name, without registering views
+            self.conn.execute("""
+                INSERT OR REPLACE INTO assets 
+                (blob_id, asset_path, asset_size, asset_type, created_at)
+                SELECT blob_id, asset_path, asset_size, asset_type, CURRENT_TIMESTAMP FROM assets_table
+            """)
+            
+            self.conn.execute("""
+                INSERT OR REPLACE INTO asset_dandiset_mappings 
+                (blob_id, dandiset_id, version_id)
+                SELECT blob_id, dandiset_id, version_id FROM mappings_table
+            """)
+        
+        pending_dandisets.clear()
+        pending_versions.clear()
+        pending_assets.clear()
+        pending_mappings.clear()
+        
+        # Commit each batch so an interrupted run keeps everything flushed so far
+        self.conn.execute("COMMIT")
+        self.conn.execute("BEGIN TRANSACTION")
+    
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in one transaction, rolling back on error."""
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+    
     def get_asset_stats(self) -> Dict:
         """Get asset database statistics."""
         stats = {}
@@ -456,14 +648,12 @@ class DuckDBAnalytics:
             # Legacy mode: insert pre-built data
             logger.info(f"Ingesting {len(assets_data):,} pre-built assets")
             
-            assets_df = pd.DataFrame(assets_data)
-            self.conn.register('assets_df_temp', assets_df)
+            assets_table = pa.Table.from_pylist(assets_data)
             
             self.conn.execute("""
                 INSERT OR REPLACE INTO assets 
-                SELECT * FROM assets_df_temp
+                SELECT * FROM assets_table
             """)
-            self.conn.execute("DROP VIEW assets_df_temp")
             
             logger.info("Asset data ingested successfully")
         else:
@@ -474,48 +664,42 @@ class DuckDBAnalytics:
         """Ingest dandiset metadata."""
         logger.info(f"Ingesting {len(dandisets_data):,} dandisets")
         
-        dandisets_df = pd.DataFrame(dandisets_data)
-        self.conn.register('dandisets_df_temp', dandisets_df)
+        dandisets_table = pa.Table.from_pylist(dandisets_data)
         
         self.conn.execute("""
             INSERT OR REPLACE INTO dandisets 
-            SELECT * FROM dandisets_df_temp
+            SELECT * FROM dandisets_table
         """)
-        self.conn.execute("DROP VIEW dandisets_df_temp")
         
         logger.info("Dandiset data ingested successfully")
     
     def create_analytics_views(self):
-        """Create optimized views that query parquet directly."""
+        """Materialize the base downloads table from parquet and create the analytics views over it."""
         logger.info("Creating analytics views...")
         
-        # Base downloads view that queries parquet directly
-        self.conn.execute(f"""
-            CREATE OR REPLACE VIEW downloads_base AS
+        # Databases built before downloads_base was materialized hold it as a view
+        self._drop_legacy_view('downloads_base')
+        
+        # Base downloads table, materialized once from the parquet so the date/time
+        # parsing is not repeated by every query over the views built on top of it;
+        # rows are clustered by blob_id so the joins to assets/mappings probe in key order
+        self.conn.execute("""
+            CREATE OR REPLACE TABLE downloads_base AS
             SELECT 
                 bm.blob_id,
                 p.day,
                 p.time,
                 p.bytes_sent,
                 p.indexed_ip,
-                -- Convert day (YYMMDD) to proper date format (YYYY-MM-DD)
-                CAST(
-                    '20' || 
-                    SUBSTR(LPAD(CAST(p.day AS VARCHAR), 6, '0'), 1, 2) || '-' ||
-                    SUBSTR(LPAD(CAST(p.day AS VARCHAR), 6, '0'), 3, 2) || '-' ||
-                    SUBSTR(LPAD(CAST(p.day AS VARCHAR), 6, '0'), 5, 2)
-                    AS DATE
-                ) as download_date,
-                -- Convert time (HHMMSS) to proper time format (HH:MM:SS)
-                CAST(
-                    SUBSTR(LPAD(CAST(p.time AS VARCHAR), 6, '0'), 1, 2) || ':' ||
-                    SUBSTR(LPAD(CAST(p.time AS VARCHAR), 6, '0'), 3, 2) || ':' ||
-                    SUBSTR(LPAD(CAST(p.time AS VARCHAR), 6, '0'), 5, 2)
-                    AS TIME
-                ) as download_time
-            FROM read_parquet('{self.parquet_path}') p
+                -- Convert day (YYMMDD) to a date with integer arithmetic; try() turns a malformed
+                -- value into NULL instead of failing the whole table
+                try(make_date(2000 + p.day // 10000, (p.day // 100) % 100, p.day % 100)) as download_date,
+                -- Convert time (HHMMSS) to a time with integer arithmetic
+                try(make_time(p.time // 10000, (p.time // 100) % 100, CAST(p.time % 100 AS DOUBLE))) as download_time
+            FROM read_parquet(?) p
             JOIN blob_mapping bm ON p.blob_index = bm.blob_index
-        """)
+            ORDER BY bm.blob_id
+        """, [str(self.parquet_path)])
         
         # Enriched downloads view with asset and dandiset information
         self.conn.execute("""
@@ -541,6 +725,11 @@ class DuckDBAnalytics:
             LEFT JOIN regions r ON ir.region_code = r.region_code
         """)
     
+    def _drop_legacy_view(self, name: str):
+        """Drop a view that newer code materializes as a table under the same name."""
+        if self.conn.execute("SELECT 1 FROM duckdb_views() WHERE view_name = ?", (name,)).fetchone():
+            self.conn.execute(f"DROP VIEW {name}")
+    
     def add_region(self, region_code: str, country: str = None, region: str = None,
                    provider: str = None, latitude: float = None, longitude: float = None):
         """Add a region."""
@@ -636,25 +825,30 @@ class DuckDBAnalytics:
             "has_multiple_mappings": assets_with_multiple_dandisets > 0
         }
     
-    def create_daily_ip_dandiset_view(self):
-        """Create daily IP-dandiset aggregation view with region information."""
-        logger.info("Creating daily IP-dandiset aggregation view...")
+    def _prepare_daily_source(self) -> str:
+        """Pick the asset-dandiset mapping the daily aggregation joins through and return its table name."""
+        self._build_ip_enriched()
         
-        # First check if we need to handle multiple dandiset mappings
+        # First check if we need to handle multiple dandiset mappings; blob_id is the primary key of
+        # asset_dandiset_mappings in the current schema, but CREATE TABLE IF NOT EXISTS keeps the
+        # schema of databases created before it was, and those can still map a blob more than once
         relationship_stats = self.analyze_asset_dandiset_relationships()
         
         if relationship_stats["has_multiple_mappings"]:
             logger.info("Creating view with multiple dandiset handling (selecting first dandiset alphabetically)...")
             
-            # Create a helper view that selects one dandiset per asset
+            # Materialize one dandiset per asset once, ordered and indexed by blob_id,
+            # instead of re-running the DISTINCT ON in every query over the downloads view
+            self._drop_legacy_view('asset_single_dandiset')
             self.conn.execute("""
-                CREATE OR REPLACE VIEW asset_single_dandiset AS
+                CREATE OR REPLACE TABLE asset_single_dandiset AS
                 SELECT DISTINCT ON (blob_id)
                     blob_id,
                     dandiset_id
                 FROM asset_dandiset_mappings
                 ORDER BY blob_id, dandiset_id  -- Choose first dandiset alphabetically
             """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_asset_single_dandiset_blob ON asset_single_dandiset (blob_id)")
             
             # Create downloads view using single dandiset mapping
             self.conn.execute("""
@@ -675,71 +869,137 @@ class DuckDBAnalytics:
                 JOIN assets a ON d.blob_id = a.blob_id
                 JOIN asset_single_dandiset asd ON a.blob_id = asd.blob_id
                 LEFT JOIN dandisets ds ON asd.dandiset_id = ds.identifier
-                LEFT JOIN ip_regions ir ON d.indexed_ip = ir.indexed_ip
-                LEFT JOIN regions r ON ir.region_code = r.region_code
+                LEFT JOIN ip_enriched r ON d.indexed_ip = r.indexed_ip
             """)
             
-            source_view = "downloads_single_dandiset"
-        else:
-            logger.info("Using existing downloads_enriched view (no multiple dandiset mappings found)...")
-            source_view = "downloads_enriched"
+            return "asset_single_dandiset"
         
-        # Create the main aggregation view
-        self.conn.execute(f"""
-            CREATE OR REPLACE VIEW daily_ip_dandiset_stats AS
+        logger.info("Using asset_dandiset_mappings directly (no multiple dandiset mappings found)...")
+        return "asset_dandiset_mappings"
+    
+    def _build_ip_enriched(self):
+        """Denormalize ip_regions with the region details of each IP into the ip_enriched table."""
+        # Rebuilt before every aggregation so it reflects the current IP-region mappings;
+        # the downloads then need one join for their region instead of two
+        self.conn.execute("""
+            CREATE OR REPLACE TABLE ip_enriched AS
             SELECT 
-                indexed_ip,
-                dandiset_id,
-                dandiset_name,
-                download_date,
-                SUM(bytes_sent) as total_bytes_downloaded,
+                ir.indexed_ip,
+                r.region_code,
+                r.country,
+                r.region,
+                r.provider,
+                r.latitude,
+                r.longitude
+            FROM ip_regions ir
+            LEFT JOIN regions r ON ir.region_code = r.region_code
+            ORDER BY ir.indexed_ip
+        """)
+    
+    def _daily_ip_dandiset_stats_sql(self, mapping_table: str) -> str:
+        """SQL for the daily IP-dandiset aggregation, joining downloads to dandisets through mapping_table."""
+        # The dandiset mapping is an inner join, so downloads without a dandiset are
+        # dropped before the dandiset and region joins instead of filtered afterwards
+        return f"""
+            SELECT 
+                d.indexed_ip,
+                m.dandiset_id,
+                ds.name as dandiset_name,
+                d.download_date,
+                SUM(d.bytes_sent) as total_bytes_downloaded,
                 COUNT(*) as total_downloads,
-                COUNT(DISTINCT blob_id) as unique_assets_downloaded,
+                COUNT(DISTINCT d.blob_id) as unique_assets_downloaded,
                 -- Region information (same for all records with same IP)
-                region_code,
-                country,
-                region,
-                provider,
-                latitude,
-                longitude
-            FROM {source_view}
-            WHERE dandiset_id IS NOT NULL  -- Exclude downloads without dandiset mapping
-            GROUP BY indexed_ip, dandiset_id, dandiset_name, download_date, 
-                     region_code, country, region, provider, latitude, longitude
+                r.region_code,
+                r.country,
+                r.region,
+                r.provider,
+                r.latitude,
+                r.longitude
+            FROM downloads_base d
+            JOIN assets a ON d.blob_id = a.blob_id
+            JOIN {mapping_table} m ON a.blob_id = m.blob_id AND m.dandiset_id IS NOT NULL
+            LEFT JOIN dandisets ds ON m.dandiset_id = ds.identifier
+            LEFT JOIN ip_enriched r ON d.indexed_ip = r.indexed_ip
+            GROUP BY d.indexed_ip, m.dandiset_id, ds.name, d.download_date, 
+                     r.region_code, r.country, r.region, r.provider, r.latitude, r.longitude
             ORDER BY download_date DESC, total_bytes_downloaded DESC
+        """
+    
+    def create_daily_ip_dandiset_view(self):
+        """Create the materialized daily IP-dandiset aggregation table with region information."""
+        logger.info("Creating daily IP-dandiset aggregation table...")
+        
+        mapping_table = self._prepare_daily_source()
+        
+        # Materialize the main aggregation once, so sampling and exporting just scan it
+        self._drop_legacy_view('daily_ip_dandiset_stats')
+        self.conn.execute(f"""
+            CREATE OR REPLACE TABLE daily_ip_dandiset_stats AS
+            {self._daily_ip_dandiset_stats_sql(mapping_table)}
         """)
         
-        logger.info("Daily IP-dandiset aggregation view created successfully")
+        # Remember which parquet the table was built from, for refresh_daily_ip_dandiset_stats
+        self.conn.execute("""
+            INSERT OR REPLACE INTO _meta (key, value) VALUES ('daily_ip_dandiset_stats_parquet_mtime', ?)
+        """, (str(Path(self.parquet_path).stat().st_mtime),))
         
+        logger.info("Daily IP-dandiset aggregation table created successfully")
+    
+    def refresh_daily_ip_dandiset_stats(self) -> bool:
+        """Rebuild downloads_base and the daily IP-dandiset table only if the parquet has changed."""
+        built_from = self.conn.execute("""
+            SELECT value FROM _meta WHERE key = 'daily_ip_dandiset_stats_parquet_mtime'
+        """).fetchone()
+        table_exists = self.conn.execute("""
+            SELECT 1 FROM duckdb_tables() WHERE table_name = 'daily_ip_dandiset_stats'
+        """).fetchone()
+        
+        if table_exists and built_from and built_from[0] == str(Path(self.parquet_path).stat().st_mtime):
+            logger.info("Daily IP-dandiset stats are up to date")
+            return False
+        
+        self.create_analytics_views()
+        self.create_daily_ip_dandiset_view()
+        return True
     
     def export_daily_ip_dandiset_stats(self, output_path: str = "daily_ip_dandiset_stats.parquet"):
         """Export daily IP-dandiset aggregation to parquet file efficiently."""
         logger.info(f"Exporting daily IP-dandiset stats to {output_path}...")
         
+        # Copy the materialized table if there is one; otherwise stream the aggregation
+        # straight into the parquet writer rather than materializing it first
+        if self.conn.execute("""
+            SELECT 1 FROM duckdb_tables() WHERE table_name = 'daily_ip_dandiset_stats'
+        """).fetchone():
+            source_sql = "SELECT * FROM daily_ip_dandiset_stats"
+        else:
+            source_sql = self._daily_ip_dandiset_stats_sql(self._prepare_daily_source())
+        
         # Use DuckDB's native COPY TO for efficient parquet export
         self.conn.execute(f"""
-            COPY (SELECT * FROM daily_ip_dandiset_stats) 
-            TO '{output_path}' (FORMAT PARQUET)
-        """)
+            COPY ({source_sql}) 
+            TO ? (FORMAT PARQUET, COMPRESSION ZSTD, ROW_GROUP_SIZE 122880)
+        """, [str(output_path)])
     
     def get_daily_ip_dandiset_sample(self, limit: int = 10) -> pd.DataFrame:
         """Get a sample of daily IP-dandiset aggregated data."""
         logger.info(f"Getting sample of {limit} daily IP-dandiset records...")
         
-        # First ensure the view exists
+        # First ensure the table exists
         try:
-            result = self.conn.execute(f"""
+            result = self.conn.execute("""
                 SELECT * FROM daily_ip_dandiset_stats 
-                LIMIT {limit}
-            """).fetchdf()
+                LIMIT ?
+            """, [limit]).fetchdf()
             return result
         except Exception as e:
-            logger.warning(f"daily_ip_dandiset_stats view not found, creating it first...")
+            logger.warning(f"daily_ip_dandiset_stats table not found, creating it first...")
             self.create_daily_ip_dandiset_view()
-            result = self.conn.execute(f"""
+            result = self.conn.execute("""
                 SELECT * FROM daily_ip_dandiset_stats 
-                LIMIT {limit}
-            """).fetchdf()
+                LIMIT ?
+            """, [limit]).fetchdf()
             return result
     
     def get_database_stats(self) -> Dict:
@@ -748,40 +1008,28 @@ class DuckDBAnalytics:
         
         stats = {}
         
-        # Get parquet file stats
+        # Get parquet file stats from the row counts in the file footers, without scanning the data
         try:
-            result = self.conn.execute(f"""
-                SELECT COUNT(*) as total_download_records
-                FROM read_parquet('{self.parquet_path}')
-            """).fetchone()
-            stats['total_download_records'] = result[0] if result else 0
+            result = self.conn.execute("""
+                SELECT SUM(num_rows) as total_download_records
+                FROM parquet_file_metadata(?)
+            """, [str(self.parquet_path)]).fetchone()
+            stats['total_download_records'] = int(result[0]) if result and result[0] is not None else 0
         except Exception as e:
             logger.warning(f"Could not get parquet stats: {e}")
             stats['total_download_records'] = 0
         
-        # Get blob mapping stats
-        result = self.conn.execute("SELECT COUNT(*) FROM blob_mapping").fetchone()
-        stats['blob_mappings'] = result[0] if result else 0
-        
-        # Get region stats
-        result = self.conn.execute("SELECT COUNT(*) FROM regions").fetchone()
-        stats['total_regions'] = result[0] if result else 0
-        
-        # Get IP-region mapping stats
-        result = self.conn.execute("SELECT COUNT(*) FROM ip_regions").fetchone()
-        stats['ip_region_mappings'] = result[0] if result else 0
-        
-        # Get asset stats
-        result = self.conn.execute("SELECT COUNT(*) FROM assets").fetchone()
-        stats['total_assets'] = result[0] if result else 0
-        
-        # Get dandiset stats
-        result = self.conn.execute("SELECT COUNT(*) FROM dandisets").fetchone()
-        stats['total_dandisets'] = result[0] if result else 0
-        
-        # Get asset-dandiset mapping stats
-        result = self.conn.execute("SELECT COUNT(*) FROM asset_dandiset_mappings").fetchone()
-        stats['asset_dandiset_mappings'] = result[0] if result else 0
+        # Get blob mapping, region, IP-region mapping, asset, dandiset and asset-dandiset mapping stats
+        cursor = self.conn.execute("""
+            SELECT
+                (SELECT COUNT(*) FROM blob_mapping) as blob_mappings,
+                (SELECT COUNT(*) FROM regions) as total_regions,
+                (SELECT COUNT(*) FROM ip_regions) as ip_region_mappings,
+                (SELECT COUNT(*) FROM assets) as total_assets,
+                (SELECT COUNT(*) FROM dandisets) as total_dandisets,
+                (SELECT COUNT(*) FROM asset_dandiset_mappings) as asset_dandiset_mappings
+        """)
+        stats.update(zip([column[0] for column in cursor.description], cursor.fetchone()))
         
         return stats
     
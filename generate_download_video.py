@@ -6,25 +6,49 @@ This script creates a video showing the progression of data downloads over time,
 with each frame representing cumulative downloads up to a specific month.
 """
 
+import duckdb
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.animation import FuncAnimation
+from matplotlib.colors import to_rgba_array
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 import imageio
+from PIL import Image
+import io
+import math
 import os
+import shutil
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+# Resolution the frames are drawn and saved at
+FRAME_DPI = 150
+
+# Generator used by the frame rendering worker processes, set by _init_frame_worker
+_worker_generator = None
+
+
+def _init_frame_worker(generator):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _render_frame(frame_args):
+    """Render one frame in a worker process, reading its snapshot from parquet."""
+    frame_index, month, snapshot_path, total_frames = frame_args
+    return _worker_generator.render_frame(frame_index, month, pd.read_parquet(snapshot_path), total_frames)
+
+
 class DownloadVideoGenerator:
     def __init__(self, parquet_path="database_with_coordinates.parquet", output_dir="video_frames"):
         self.parquet_path = parquet_path
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True)
+        self.conn = duckdb.connect()
         
         # Color scheme matching the web app
         self.volume_thresholds = {
@@ -40,74 +64,149 @@ class DownloadVideoGenerator:
             'very-high': {'fill': '#ff7043', 'stroke': '#d84315'} # Orange-red
         }
         
+        # Volume categories in threshold order, with RGBA colors indexed by category number
+        self.volume_categories = ['low', 'medium', 'high', 'very-high']
+        self.volume_threshold_values = np.array(list(self.volume_thresholds.values()))
+        self.fill_color_lut = to_rgba_array([self.color_map[category]['fill'] for category in self.volume_categories])
+        self.stroke_color_lut = to_rgba_array([self.color_map[category]['stroke'] for category in self.volume_categories])
+        
+        self.byte_units = ['B', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB']
+        
+        # Map extent (lon_min, lon_max, lat_min, lat_max); the basemap is rendered once on first use
+        self.map_extent = [-170, 180, -60, 85]
+        self.basemap = None
+        
+        # Figure reused across frames, created on first use
+        self.fig = None
+        
+    def __getstate__(self):
+        # The DuckDB connection is only needed for loading data and cannot be sent to worker processes;
+        # each worker creates its own figure on first use
+        state = self.__dict__.copy()
+        state['conn'] = None
+        state['fig'] = None
+        for name in ('map_ax', 'chart_ax', 'title_text', 'stats_text', 'bubble_artists', 'timeline_bars'):
+            state.pop(name, None)
+        return state
+    
     def load_and_process_data(self):
-        """Load parquet data and process for monthly aggregation."""
+        """Load the parquet data with a week column for weekly aggregation, as an Arrow table."""
         print("Loading data from parquet file...")
-        df = pd.read_parquet(self.parquet_path)
-        
-        # Convert download_date to datetime
-        df['download_date'] = pd.to_datetime(df['download_date'])
-        
-        # Create year-week column for grouping
-        df['year_week'] = df['download_date'].dt.to_period('W')
-        
-        # Sort by date to ensure proper progression
-        df = df.sort_values('download_date')
-        
-        print(f"Loaded {len(df)} records from {df['download_date'].min()} to {df['download_date'].max()}")
-        print(f"Data spans {df['year_week'].nunique()} weeks")
-        
-        return df
+        downloads = self.conn.execute("""
+            SELECT
+                CAST(download_date AS TIMESTAMP) AS download_date,
+                date_trunc('week', CAST(download_date AS TIMESTAMP)) AS year_week,
+                region,
+                latitude,
+                longitude,
+                dandiset_id,
+                total_bytes_sent
+            FROM read_parquet(?)
+        """, [str(self.parquet_path)]).fetch_arrow_table()
+        
+        total_records, first_date, last_date, total_weeks = self.conn.execute("""
+            SELECT COUNT(*), MIN(download_date), MAX(download_date), COUNT(DISTINCT year_week)
+            FROM downloads
+        """).fetchone()
+        print(f"Loaded {total_records} records from {first_date} to {last_date}")
+        print(f"Data spans {total_weeks} weeks")
+        
+        return downloads
     
     def get_volume_category(self, total_bytes):
         """Categorize volume based on thresholds matching web app."""
-        if total_bytes <= self.volume_thresholds['threshold1']:
-            return 'low'
-        elif total_bytes <= self.volume_thresholds['threshold2']:
-            return 'medium'
-        elif total_bytes <= self.volume_thresholds['threshold3']:
-            return 'high'
-        else:
-            return 'very-high'
+        return self.volume_categories[self.get_volume_category_indices(total_bytes)]
+    
+    def get_volume_category_indices(self, total_bytes):
+        """Categorize volumes, returning indices into volume_categories; works on scalars and arrays."""
+        # Thresholds are inclusive upper bounds, which is what the left-side search gives
+        return np.searchsorted(self.volume_threshold_values, total_bytes)
     
     def format_bytes(self, bytes_value):
         """Format bytes into human readable format."""
         if bytes_value == 0:
             return "0 B"
         
-        for unit in ['B', 'KB', 'MB', 'GB', 'TB', 'PB']:
-            if bytes_value < 1024.0:
-                return f"{bytes_value:.1f} {unit}"
-            bytes_value /= 1024.0
-        return f"{bytes_value:.1f} EB"
+        # Anything below 1 KB, including negative values, stays in bytes
+        if bytes_value < 1024:
+            return f"{bytes_value:.1f} B"
+        
+        # Each unit is 2**10 times the previous one, so the unit follows from the base-2 logarithm
+        # of the value as a float (as the scaling divides it)
+        bytes_value = float(bytes_value)
+        exponent = min(int(math.log2(bytes_value)) // 10, len(self.byte_units) - 1)
+        # log2 rounds up just below a unit boundary (e.g. 2**50 - 1); step those back down
+        if bytes_value < 1024 ** exponent:
+            exponent -= 1
+        return f"{bytes_value / 1024 ** exponent:.1f} {self.byte_units[exponent]}"
     
-    def create_weekly_snapshots(self, df):
-        """Create cumulative weekly snapshots of downloads by region."""
+    def create_weekly_snapshots(self, downloads):
+        """Create cumulative weekly snapshots of downloads by region, returning the parquet file of each week."""
         print("Creating weekly snapshots...")
         
-        # Get all unique weeks
-        all_weeks = sorted(df['year_week'].unique())
+        # Per-week totals for each region, accumulated across weeks with a window sum.
+        # A dandiset counts towards a region from the first week it was downloaded there,
+        # so the running sum of new dandisets gives the distinct count up to each week.
+        cumulative = self.conn.execute("""
+            WITH located_downloads AS (
+                SELECT year_week AS week, region, latitude, longitude, dandiset_id, total_bytes_sent
+                FROM downloads
+                WHERE region IS NOT NULL AND latitude IS NOT NULL AND longitude IS NOT NULL
+            ),
+            weekly_bytes AS (
+                SELECT week, region, latitude, longitude, SUM(total_bytes_sent) AS weekly_bytes
+                FROM located_downloads
+                GROUP BY ALL
+            ),
+            new_dandisets AS (
+                SELECT week, region, latitude, longitude, COUNT(*) AS new_dandisets
+                FROM (
+                    SELECT region, latitude, longitude, dandiset_id, MIN(week) AS week
+                    FROM located_downloads
+                    WHERE dandiset_id IS NOT NULL
+                    GROUP BY ALL
+                )
+                GROUP BY ALL
+            ),
+            weeks AS (
+                SELECT DISTINCT year_week AS week FROM downloads
+            ),
+            regions AS (
+                SELECT DISTINCT region, latitude, longitude FROM weekly_bytes
+            )
+            SELECT
+                w.week,
+                r.region,
+                r.latitude,
+                r.longitude,
+                CAST(SUM(COALESCE(wb.weekly_bytes, 0)) OVER region_weeks AS BIGINT) AS total_bytes_sent,
+                CAST(SUM(COALESCE(nd.new_dandisets, 0)) OVER region_weeks AS BIGINT) AS dandiset_id
+            FROM weeks w
+            CROSS JOIN regions r
+            LEFT JOIN weekly_bytes wb USING (week, region, latitude, longitude)
+            LEFT JOIN new_dandisets nd USING (week, region, latitude, longitude)
+            WINDOW region_weeks AS (PARTITION BY r.region, r.latitude, r.longitude ORDER BY w.week)
+            QUALIFY total_bytes_sent > 0
+            ORDER BY w.week, r.region, r.latitude, r.longitude
+        """).df()
+        
+        # Log of the cumulative totals for bubble sizing, computed once for every snapshot;
+        # single precision is plenty for sizing and halves the column
+        cumulative['log_bytes'] = np.log(cumulative['total_bytes_sent'].to_numpy(dtype=np.float32))
+        
+        region_totals_by_week = {
+            week: region_totals.drop(columns='week').reset_index(drop=True)
+            for week, region_totals in cumulative.groupby('week', sort=False)
+        }
+        empty_snapshot = cumulative.drop(columns='week').iloc[:0]
+        
+        all_weeks = self.conn.execute("SELECT DISTINCT year_week FROM downloads ORDER BY year_week").fetchall()
         
         snapshots = {}
         
-        for i, current_week in enumerate(all_weeks):
-            # Get all data up to and including current week
-            mask = df['year_week'] <= current_week
-            cumulative_df = df[mask]
-            
-            # Aggregate by region
-            region_totals = cumulative_df.groupby(['region', 'latitude', 'longitude']).agg({
-                'total_bytes_sent': 'sum',
-                'dandiset_id': 'nunique'
-            }).reset_index()
-            
-            # Filter out regions with no downloads
-            region_totals = region_totals[region_totals['total_bytes_sent'] > 0]
-            
-            snapshots[current_week] = region_totals
-            
-            if (i + 1) % 25 == 0:
-                print(f"Processed {i + 1}/{len(all_weeks)} weeks")
+        for (week,) in all_weeks:
+            week = pd.Timestamp(week)
+            snapshots[week.to_period('W')] = region_totals_by_week.get(week, empty_snapshot)
         
         print(f"Created {len(snapshots)} weekly snapshots")
         
@@ -146,37 +245,87 @@ class DownloadVideoGenerator:
         self.timeline_weeks = [week.to_timestamp() for week in all_weeks]
         self.max_cumulative = max(self.cumulative_timeline) if self.cumulative_timeline else 0
         print(f"Timeline: {len(self.cumulative_timeline)} weeks, max cumulative: {self.format_bytes(self.max_cumulative)}")
+        
+        # Write each snapshot to its own parquet file, so frame workers only read the weeks they render
+        snapshot_dir = self.output_dir / "_snap"
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        snapshot_paths = {}
+        for i, week in enumerate(all_weeks):
+            snapshot_path = snapshot_dir / f"week_{i:04d}.parquet"
+            snapshots[week].to_parquet(snapshot_path, compression='zstd', index=False)
+            snapshot_paths[week] = snapshot_path
             
-        return snapshots
+        return snapshot_paths
     
-    def create_frame(self, month_data, month_period, frame_num, total_frames):
-        """Create a single frame of the video."""
-        fig = plt.figure(figsize=(16, 12), facecolor='white')
+    def init_figure(self):
+        """Create the figure, map and chart axes and the static artists shared by all frames."""
+        self.fig = plt.figure(figsize=(16, 12), facecolor='white')
         
         # Create map subplot first and let cartopy resize it
-        ax = fig.add_subplot(111, projection=ccrs.PlateCarree())
-        ax.set_extent([-170, 180, -60, 85], crs=ccrs.PlateCarree())
+        self.map_ax = self.fig.add_subplot(111, projection=ccrs.PlateCarree())
+        self.map_ax.set_extent(self.map_extent, crs=ccrs.PlateCarree())
         
         # After cartopy adjusts the map, get its actual position
-        fig.canvas.draw()  # Force drawing to get actual positions
-        map_bbox = ax.get_position()
+        self.fig.canvas.draw()  # Force drawing to get actual positions
+        map_bbox = self.map_ax.get_position()
         
         # Calculate position for bar chart - place it just below the map
         chart_height = 0.15  # Height for the chart
         chart_bottom = map_bbox.y0 - chart_height - 0.02 - .1  # Small gap below map
         
         # Create bar chart subplot with manual positioning
-        chart_ax = fig.add_axes([map_bbox.x0, chart_bottom, map_bbox.width, chart_height])
-        self.add_cumulative_chart_subplot(chart_ax, frame_num, total_frames)
+        self.chart_ax = self.fig.add_axes([map_bbox.x0, chart_bottom, map_bbox.width, chart_height])
+        self.add_cumulative_chart_subplot(self.chart_ax)
+        
+        # Add the pre-rendered map features as the background
+        if self.basemap is None:
+            self.basemap = self.render_basemap()
+        self.map_ax.imshow(
+            self.basemap,
+            origin='upper',
+            extent=self.map_extent,
+            transform=ccrs.PlateCarree(),
+            zorder=0
+        )
         
-        # Add map features
-        ax.add_feature(cfeature.LAND, color="#dde9de", alpha=0.8)
-        ax.add_feature(cfeature.OCEAN, color='#e3f2fd', alpha=0.8)
-        ax.add_feature(cfeature.COASTLINE, color='#666666', linewidth=0.5)
-        ax.add_feature(cfeature.BORDERS, color='#999999', linewidth=0.3)
-        ax.add_feature(cfeature.LAKES, color='#b3e5fc', alpha=0.8)
-        ax.add_feature(cfeature.RIVERS, color='#90caf9', linewidth=0.5)
-        ax.add_feature(cfeature.STATES, linestyle='--', linewidth=0.5, alpha=0.8, edgecolor='#cccccc')
+        # Title and statistics text, updated on every frame
+        self.title_text = self.fig.suptitle(
+            'DANDI Archive Downloads Progression\n',
+            fontsize=20,
+            fontweight='bold',
+            y=0.8
+        )
+        
+        # Add stats box in bottom left, above the legend
+        props = dict(boxstyle='round', facecolor='white', alpha=0.8)
+        self.stats_text = self.map_ax.text(
+            0.02, 0.25, '',
+            transform=self.map_ax.transAxes,
+            fontsize=12,
+            verticalalignment='bottom',
+            bbox=props,
+            zorder=10
+        )
+        
+        # Add legend
+        self.add_legend(self.map_ax)
+        
+        self.fig.tight_layout()
+        
+        # Bubbles drawn for the previous frame, removed before drawing the next one
+        self.bubble_artists = []
+    
+    def create_frame(self, month_data, month_period, frame_num, total_frames):
+        """Update the shared figure to show a single frame of the video."""
+        if self.fig is None:
+            self.init_figure()
+        ax = self.map_ax
+        
+        for artist in self.bubble_artists:
+            artist.remove()
+        self.bubble_artists = []
+        
+        self.update_cumulative_chart(frame_num)
         
         if len(month_data) == 0:
             # No data for this month, show empty map
@@ -184,50 +333,40 @@ class DownloadVideoGenerator:
         else:
             # Use global scaling for consistent bubble sizes across all frames
             if self.global_max_bytes > self.global_min_bytes:
-                # Sort regions by total_bytes_sent to ensure proper z-ordering (smallest first, largest last)
+                # Sort regions by total_bytes_sent so larger bubbles are drawn on top of smaller ones
                 sorted_data = month_data.sort_values('total_bytes_sent', ascending=True)
+                bytes_sent = sorted_data['total_bytes_sent'].to_numpy()
                 
-                # Create bubble markers
-                for _, region in sorted_data.iterrows():
-                    # Calculate bubble size using global scaling (logarithmic)
-                    log_bytes = np.log(region['total_bytes_sent'])
-                    normalized_size = (log_bytes - self.global_log_min) / (self.global_log_max - self.global_log_min)
-                    
-                    # Smaller size range from 10 to 200 square points (reduced from 20-400)
-                    min_size = 5
-                    max_size = 125
-                    bubble_size = min_size + (normalized_size * (max_size - min_size))
-                    
-                    # Get color based on volume category
-                    category = self.get_volume_category(region['total_bytes_sent'])
-                    color = self.color_map[category]['fill']
-                    edge_color = self.color_map[category]['stroke']
-                    
-                    # Calculate z-order based on volume (higher volume = higher z-order)
-                    volume_zorder = 5 + int(normalized_size * 10)  # Range from 5 to 15
-                    
-                    # Plot bubble
-                    ax.scatter(
-                        region['longitude'], region['latitude'],
-                        s=bubble_size,
-                        c=color,
-                        edgecolors=edge_color,
-                        linewidths=1,
-                        alpha=0.7,
-                        transform=ccrs.PlateCarree(),
-                        zorder=volume_zorder
-                    )
-        
-        # Add title with current month
+                # Calculate bubble sizes using global scaling (logarithmic)
+                log_bytes = sorted_data['log_bytes'].to_numpy()
+                normalized_sizes = (log_bytes - self.global_log_min) / (self.global_log_max - self.global_log_min)
+                
+                # Smaller size range from 10 to 200 square points (reduced from 20-400)
+                min_size = 5
+                max_size = 125
+                bubble_sizes = min_size + (normalized_sizes * (max_size - min_size))
+                
+                # Get colors based on volume category
+                categories = self.get_volume_category_indices(bytes_sent)
+                
+                # Plot all bubbles as a single collection
+                bubbles = ax.scatter(
+                    sorted_data['longitude'].to_numpy(), sorted_data['latitude'].to_numpy(),
+                    s=bubble_sizes,
+                    c=self.fill_color_lut[categories],
+                    edgecolors=self.stroke_color_lut[categories],
+                    linewidths=1,
+                    alpha=0.7,
+                    transform=ccrs.PlateCarree(),
+                    zorder=5
+                )
+                self.bubble_artists.append(bubbles)
+        
+        # Update title with current month
         month_str = month_period.strftime('%B %Y')
-        plt.suptitle(
-            f'DANDI Archive Downloads Progression\n{month_str}',
-            fontsize=20,
-            fontweight='bold',
-            y=0.8
-        )
+        self.title_text.set_text(f'DANDI Archive Downloads Progression\n{month_str}')
         
-        # Add statistics text
+        # Update statistics text
         if len(month_data) > 0:
             total_downloads = month_data['total_bytes_sent'].sum()
             total_regions = len(month_data)
@@ -238,24 +377,32 @@ class DownloadVideoGenerator:
             )
         else:
             stats_text = "No downloads recorded yet"
+        self.stats_text.set_text(stats_text)
         
-        # Add stats box in bottom left, above the legend
-        props = dict(boxstyle='round', facecolor='white', alpha=0.8)
-        ax.text(
-            0.02, 0.25, stats_text,
-            transform=ax.transAxes,
-            fontsize=12,
-            verticalalignment='bottom',
-            bbox=props,
-            zorder=10
-        )
+        return self.fig
+    
+    def render_basemap(self, width=16, dpi=150):
+        """Render the static map features once into an RGB image covering the map extent."""
+        lon_min, lon_max, lat_min, lat_max = self.map_extent
+        height = width * (lat_max - lat_min) / (lon_max - lon_min)
+        fig = plt.figure(figsize=(width, height), dpi=dpi, facecolor='white')
         
-        # Add legend
-        self.add_legend(ax)
+        ax = fig.add_axes([0, 0, 1, 1], projection=ccrs.PlateCarree())
+        ax.set_extent(self.map_extent, crs=ccrs.PlateCarree())
+        ax.set_axis_off()
         
-        plt.tight_layout()
+        ax.add_feature(cfeature.LAND, color="#dde9de", alpha=0.8)
+        ax.add_feature(cfeature.OCEAN, color='#e3f2fd', alpha=0.8)
+        ax.add_feature(cfeature.COASTLINE, color='#666666', linewidth=0.5)
+        ax.add_feature(cfeature.BORDERS, color='#999999', linewidth=0.3)
+        ax.add_feature(cfeature.LAKES, color='#b3e5fc', alpha=0.8)
+        ax.add_feature(cfeature.RIVERS, color='#90caf9', linewidth=0.5)
+        ax.add_feature(cfeature.STATES, linestyle='--', linewidth=0.5, alpha=0.8, edgecolor='#cccccc')
         
-        return fig
+        fig.canvas.draw()
+        basemap = np.asarray(fig.canvas.buffer_rgba())[:, :, :3].copy()
+        plt.close(fig)
+        return basemap
     
     def add_legend(self, ax):
         """Add color legend to the plot."""
@@ -281,119 +428,167 @@ class DownloadVideoGenerator:
         )
         legend.get_frame().set_facecolor('white')
         legend.get_frame().set_alpha(0.8)
+        
+        # The legend draws its own copies of the handles; the empty scatters are not needed on the axes
+        for legend_element in legend_elements:
+            legend_element.remove()
     
-    def add_cumulative_chart_subplot(self, chart_ax, current_frame, total_frames):
-        """Add cumulative downloads bar chart as a separate subplot."""
+    def add_cumulative_chart_subplot(self, chart_ax):
+        """Add cumulative downloads bar chart as a separate subplot, with every week's bar at zero height."""
         from matplotlib.dates import DateFormatter
         import matplotlib.dates as mdates
         
-        # Get data up to current frame
-        current_index = current_frame - 1
-        if current_index >= 0 and current_index < len(self.cumulative_timeline):
-            x_data = self.timeline_weeks[:current_index + 1]
-            y_data = self.cumulative_timeline[:current_index + 1]
-            
-            if len(x_data) > 0:
-                # Create bar chart
-                chart_ax.bar(x_data, y_data, color='#2196F3', alpha=0.7, width=7)  # width in days
-                
-                # Set chart limits and formatting
-                chart_ax.set_xlim(self.timeline_weeks[0], self.timeline_weeks[-1])
-                chart_ax.set_ylim(0, self.max_cumulative * 1.1)
-                
-                # Format y-axis with byte formatting
-                max_val = self.max_cumulative
-                if max_val > 1e12:  # TB
-                    chart_ax.set_ylabel('Downloads (TB)', fontsize=12)
-                    y_ticks = chart_ax.get_yticks()
-                    chart_ax.set_yticklabels([f'{tick/1e12:.0f}' for tick in y_ticks], fontsize=10)
-                elif max_val > 1e9:  # GB
-                    chart_ax.set_ylabel('Downloads (GB)', fontsize=12)
-                    y_ticks = chart_ax.get_yticks()
-                    chart_ax.set_yticklabels([f'{tick/1e9:.0f}' for tick in y_ticks], fontsize=10)
-                else:  # MB
-                    chart_ax.set_ylabel('Downloads (MB)', fontsize=12)
-                    y_ticks = chart_ax.get_yticks()
-                    chart_ax.set_yticklabels([f'{tick/1e6:.0f}' for tick in y_ticks], fontsize=10)
-                
-                # Format x-axis
-                chart_ax.xaxis.set_major_formatter(DateFormatter('%Y'))
-                chart_ax.xaxis.set_major_locator(mdates.YearLocator())
-                chart_ax.tick_params(axis='x', labelsize=10, rotation=45)
-                chart_ax.tick_params(axis='y', labelsize=10)
-                
-                
-                # Style the chart
-                chart_ax.grid(True, alpha=0.3)
-                chart_ax.set_facecolor('white')
-                
-                # Add border
-                for spine in chart_ax.spines.values():
-                    spine.set_edgecolor('black')
-                    spine.set_linewidth(1)
-        else:
-            # No data yet, show empty chart
-            chart_ax.set_xlim(self.timeline_weeks[0], self.timeline_weeks[-1])
-            chart_ax.set_ylim(0, self.max_cumulative * 1.1)
-            chart_ax.set_ylabel('Downloads', fontsize=12)
-            chart_ax.grid(True, alpha=0.3)
+        # Create one bar per week; frames only change their heights
+        self.timeline_bars = chart_ax.bar(
+            self.timeline_weeks, np.zeros(len(self.timeline_weeks)),
+            color='#2196F3', alpha=0.7, width=7  # width in days
+        )
+        self.shown_bars = 0
+        
+        # Set chart limits and formatting
+        chart_ax.set_xlim(self.timeline_weeks[0], self.timeline_weeks[-1])
+        chart_ax.set_ylim(0, self.max_cumulative * 1.1)
+        
+        # Format y-axis with byte formatting
+        max_val = self.max_cumulative
+        if max_val > 1e12:  # TB
+            chart_ax.set_ylabel('Downloads (TB)', fontsize=12)
+            y_ticks = chart_ax.get_yticks()
+            chart_ax.set_yticklabels([f'{tick/1e12:.0f}' for tick in y_ticks], fontsize=10)
+        elif max_val > 1e9:  # GB
+            chart_ax.set_ylabel('Downloads (GB)', fontsize=12)
+            y_ticks = chart_ax.get_yticks()
+            chart_ax.set_yticklabels([f'{tick/1e9:.0f}' for tick in y_ticks], fontsize=10)
+        else:  # MB
+            chart_ax.set_ylabel('Downloads (MB)', fontsize=12)
+            y_ticks = chart_ax.get_yticks()
+            chart_ax.set_yticklabels([f'{tick/1e6:.0f}' for tick in y_ticks], fontsize=10)
+        
+        # Format x-axis
+        chart_ax.xaxis.set_major_formatter(DateFormatter('%Y'))
+        chart_ax.xaxis.set_major_locator(mdates.YearLocator())
+        chart_ax.tick_params(axis='x', labelsize=10, rotation=45)
+        chart_ax.tick_params(axis='y', labelsize=10)
+        
+        # Style the chart
+        chart_ax.grid(True, alpha=0.3)
+        chart_ax.set_facecolor('white')
+        
+        # Add border
+        for spine in chart_ax.spines.values():
+            spine.set_edgecolor('black')
+            spine.set_linewidth(1)
     
-    def generate_frames(self, snapshots):
-        """Generate all video frames."""
+    def update_cumulative_chart(self, current_frame):
+        """Show the bars of all weeks up to the current frame."""
+        # Workers may render frames out of order, so bars are raised or lowered from the last frame drawn
+        shown_bars = min(max(current_frame, 0), len(self.timeline_bars))
+        for i in range(self.shown_bars, shown_bars):
+            self.timeline_bars[i].set_height(self.cumulative_timeline[i])
+        for i in range(shown_bars, self.shown_bars):
+            self.timeline_bars[i].set_height(0)
+        self.shown_bars = shown_bars
+    
+    def render_frame(self, frame_index, month, month_data, total_frames):
+        """Create a single frame and return it as an RGB array, cropped like a tight-bbox PNG."""
+        fig = self.create_frame(month_data, month.to_timestamp(), frame_index + 1, total_frames)
+        
+        # Render the raw RGBA pixels instead of encoding a PNG, cropped to a padded tight bounding
+        # box measured once at the frame dpi; Agg sizes the saved canvas from that same box
+        figure_dpi = fig.dpi
+        fig.set_dpi(FRAME_DPI)
+        try:
+            fig.draw_without_rendering()
+            bbox = fig.get_tightbbox(fig.canvas.get_renderer()).padded(0.1)
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format='rgba', dpi=FRAME_DPI, bbox_inches=bbox, facecolor='white')
+        finally:
+            fig.set_dpi(figure_dpi)
+        width, height = int(bbox.width * FRAME_DPI), int(bbox.height * FRAME_DPI)
+        
+        image = np.frombuffer(buffer.getbuffer(), dtype=np.uint8).reshape(height, width, 4)
+        return image[:, :, :3].copy()
+    
+    def generate_frames(self, snapshots, max_workers=None):
+        """Render all video frames in parallel worker processes, yielding them in order as RGB arrays."""
         print("Generating video frames...")
         
         months = sorted(snapshots.keys())
         total_frames = len(months)
         
-        frame_paths = []
+        # Render the shared basemap up front so the workers receive it instead of each rendering their own
+        if self.basemap is None:
+            self.basemap = self.render_basemap()
         
-        for i, month in enumerate(months):
-            month_data = snapshots[month]
-            
-            # Create frame
-            fig = self.create_frame(month_data, month.to_timestamp(), i + 1, total_frames)
-            
-            # Save frame
-            frame_path = self.output_dir / f"frame_{i:04d}.png"
-            plt.savefig(frame_path, dpi=150, bbox_inches='tight', facecolor='white')
-            plt.close(fig)
-            
-            frame_paths.append(frame_path)
-            
-            if (i + 1) % 5 == 0:
-                print(f"Generated {i + 1}/{total_frames} frames")
+        frame_args = [(i, month, snapshots[month], total_frames) for i, month in enumerate(months)]
+        
+        with ProcessPoolExecutor(
+            max_workers=max_workers or os.cpu_count(),
+            initializer=_init_frame_worker,
+            initargs=(self,)
+        ) as executor:
+            for i, frame in enumerate(executor.map(_render_frame, frame_args)):
+                yield frame
+                
+                if (i + 1) % 5 == 0:
+                    print(f"Generated {i + 1}/{total_frames} frames")
         
         print(f"Generated all {total_frames} frames")
-        return frame_paths
     
-    def create_video(self, frame_paths, output_path="dandi_downloads_progression.mp4", fps=2):
-        """Create video from frames."""
+    def create_gif_palette(self, snapshots):
+        """Compute the 256-color GIF palette shared by all frames from the frame of the last week, or None without weeks."""
+        if not snapshots:
+            return None
+        
+        # The last frame has the most bubbles and the full bar chart, so it holds every color in the video
+        months = sorted(snapshots.keys())
+        frame = self.render_frame(len(months) - 1, months[-1], pd.read_parquet(snapshots[months[-1]]), len(months))
+        return Image.fromarray(frame).quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    
+    def create_video(self, frames, output_path="dandi_downloads_progression.mp4", fps=2, gif_palette=None):
+        """Create video from frames as they are rendered, returning them quantized to gif_palette for the GIF."""
         print(f"Creating video: {output_path}")
         
+        gif_frames = []
         with imageio.get_writer(output_path, fps=fps) as writer:
-            for frame_path in frame_paths:
-                image = imageio.imread(frame_path)
-                writer.append_data(image)
+            for frame in frames:
+                writer.append_data(frame)
+                
+                # Keep an 8-bit paletted copy instead of the RGB frame; without dithering, pixels that
+                # do not change between frames map to the same palette index. Without a shared
+                # palette each frame gets its own
+                if gif_palette is None:
+                    gif_frames.append(Image.fromarray(frame).quantize(colors=256, method=Image.Quantize.FASTOCTREE))
+                else:
+                    gif_frames.append(Image.fromarray(frame).quantize(palette=gif_palette, dither=Image.Dither.NONE))
         
         print(f"Video saved: {output_path}")
+        return gif_frames
     
-    def create_gif(self, frame_paths, output_path="dandi_downloads_progression.gif", duration=0.5):
-        """Create animated GIF from frames."""
-        print(f"Creating GIF: {output_path}")
+    def create_gif(self, frames, output_path="dandi_downloads_progression.gif", duration=0.5):
+        """Create animated GIF from palette-quantized frames."""
+        if not frames:
+            print(f"No frames to write, skipping GIF: {output_path}")
+            return
         
-        images = []
-        for frame_path in frame_paths:
-            images.append(imageio.imread(frame_path))
+        print(f"Creating GIF: {output_path}")
         
-        imageio.mimsave(output_path, images, duration=duration)
+        # Frames share one palette, so Pillow only stores the region that changed from the previous frame
+        frames[0].save(
+            output_path,
+            save_all=True,
+            append_images=frames[1:],
+            duration=int(duration * 1000),  # milliseconds per frame
+            loop=0
+        )
         print(f"GIF saved: {output_path}")
     
-    def cleanup_frames(self, frame_paths):
-        """Remove temporary frame files."""
-        print("Cleaning up temporary frames...")
-        for frame_path in frame_paths:
-            frame_path.unlink()
-        self.output_dir.rmdir()
+    def cleanup_snapshots(self):
+        """Remove the temporary snapshot files, including any left by an interrupted write."""
+        print("Cleaning up temporary snapshots...")
+        shutil.rmtree(self.output_dir / "_snap", ignore_errors=True)
+        if self.output_dir.is_dir() and not any(self.output_dir.iterdir()):
+            self.output_dir.rmdir()
         print("Cleanup complete")
     
     def generate_video(self, output_video="dandi_downloads_progression.mp4", 
@@ -405,25 +600,25 @@ class DownloadVideoGenerator:
         # Load and process data
         df = self.load_and_process_data()
         
-        # Create weekly snapshots
-        snapshots = self.create_weekly_snapshots(df)
-        
-        # Generate frames
-        frame_paths = self.generate_frames(snapshots)
-        
-        # Create video outputs
-        self.create_video(frame_paths, output_video, fps)
-        self.create_gif(frame_paths, output_gif, duration=1.0/fps)
-        
-        # Cleanup
-        if cleanup:
-            self.cleanup_frames(frame_paths)
+        # Snapshot files are removed even when a worker fails, so none are left for the next run
+        try:
+            # Create weekly snapshots
+            snapshots = self.create_weekly_snapshots(df)
+            
+            # Generate frames, encoding the video as they are rendered
+            gif_palette = self.create_gif_palette(snapshots)
+            frames = self.create_video(self.generate_frames(snapshots), output_video, fps, gif_palette)
+            self.create_gif(frames, output_gif, duration=1.0/fps)
+        finally:
+            # Cleanup
+            if cleanup:
+                self.cleanup_snapshots()
         
         print("\n=== Video Generation Complete ===")
         print(f"Video: {output_video}")
         print(f"GIF: {output_gif}")
-        print(f"Frames: {len(frame_paths)}")
-        print(f"Duration: {len(frame_paths)/fps:.1f} seconds")
+        print(f"Frames: {len(frames)}")
+        print(f"Duration: {len(frames)/fps:.1f} seconds")
 
 def main():
     """Main execution function."""
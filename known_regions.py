@@ -1,4 +1,8 @@
+import functools
 import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 import requests
 
@@ -51,20 +55,114 @@ _DEFAULT_REGION_CODES_TO_COORDINATES = {
     "unknown": {"latitude": None, "longitude": None},
 }
 
+# Lowercased keys for the heuristic match, computed once; region codes with a country prefix
+# are only compared against the entries for that country
+_LOWERCASE_KEYS = {key.lower(): key for key in _DEFAULT_REGION_CODES_TO_COORDINATES}
+_LOWERCASE_KEYS_BY_COUNTRY = defaultdict(list)
+for _lowercase_key, _key in _LOWERCASE_KEYS.items():
+    _LOWERCASE_KEYS_BY_COUNTRY[_lowercase_key.split("/")[0]].append((_lowercase_key, _key))
+
 opencage_api_key = os.environ.get("OPENCAGE_API_KEY", None)
 
+# Seconds to wait for an OpenCage response before treating the request as failed
+OPENCAGE_TIMEOUT = 10
+
 
-def get_region_coordinates(region_code: str) -> dict:
+def get_region_coordinates(region_code: str, conn=None) -> dict:
     """
     Get the coordinates for a given region code.
     
     Args:
         region_code: The region code to look up.
+        conn: Optional DuckDB connection whose `region_cache` table is checked before,
+            and updated after, an OpenCage request.
         
     Returns:
         A dictionary with 'latitude' and 'longitude' keys, or None if not found.
     """
+    known_coordinates = _match_known_region(region_code)
+    if known_coordinates is not None:
+        return known_coordinates
+    
+    if conn is not None:
+        _create_region_cache(conn)
+        cached = conn.execute(
+            "SELECT latitude, longitude FROM region_cache WHERE region_code = ?", [region_code]
+        ).fetchone()
+        if cached is not None:
+            return {"latitude": cached[0], "longitude": cached[1]}
+    
+    # use OpenCage API service to get coordinates
+    if opencage_api_key:
+        try:
+            coordinates = _get_opencage_coordinates(region_code)
+        except LookupError:
+            return {"latitude": None, "longitude": None}
+        if conn is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO region_cache VALUES (?, ?, ?)",
+                [region_code, coordinates["latitude"], coordinates["longitude"]],
+            )
+        return coordinates
+    return {"latitude": None, "longitude": None}
+
+
+def resolve_regions(region_codes: list, conn=None, max_workers: int = 16) -> dict:
+    """
+    Get the coordinates for many region codes at once.
+    
+    Region codes not covered by the predefined dictionary are looked up in the
+    `region_cache` table of the given DuckDB connection, and whatever is still
+    missing is requested from the OpenCage API concurrently over a shared session.
+    Successful lookups are written back to `region_cache` so later runs skip them.
+    
+    Args:
+        region_codes: The region codes to look up; duplicates are ignored.
+        conn: Optional DuckDB connection holding the `region_cache` table.
+        max_workers: Number of concurrent OpenCage requests.
+        
+    Returns:
+        A dictionary mapping each region code to its coordinates dictionary.
+    """
+    resolved = {}
+    unknown = []
+    for region_code in dict.fromkeys(region_codes):
+        known_coordinates = _match_known_region(region_code)
+        if known_coordinates is not None:
+            resolved[region_code] = known_coordinates
+        else:
+            unknown.append(region_code)
+    
+    if unknown and conn is not None:
+        _create_region_cache(conn)
+        cached = conn.execute(
+            "SELECT region_code, latitude, longitude FROM region_cache WHERE list_contains(?, region_code)",
+            [unknown],
+        ).fetchall()
+        for region_code, latitude, longitude in cached:
+            resolved[region_code] = {"latitude": latitude, "longitude": longitude}
+        unknown = [region_code for region_code in unknown if region_code not in resolved]
+    
+    if unknown and opencage_api_key:
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(lambda region_code: _query_opencage(region_code, session), unknown))
+        
+        fetched = []
+        for region_code, coordinates in zip(unknown, results):
+            if coordinates is None:
+                continue
+            resolved[region_code] = coordinates
+            fetched.append((region_code, coordinates["latitude"], coordinates["longitude"]))
+        if fetched and conn is not None:
+            conn.executemany("INSERT OR REPLACE INTO region_cache VALUES (?, ?, ?)", fetched)
+    
+    for region_code in unknown:
+        resolved.setdefault(region_code, {"latitude": None, "longitude": None})
+    return resolved
 
+
+def _match_known_region(region_code: str) -> Optional[dict]:
+    """Look up a region code in the predefined dictionary; None if it has no match there."""
     if region_code in _KNOWN_SERVICES:
         return {"latitude": None, "longitude": None}
     
@@ -73,20 +171,58 @@ def get_region_coordinates(region_code: str) -> dict:
         return _DEFAULT_REGION_CODES_TO_COORDINATES[region_code]
     
     # Attempt to match using heuristic
-    for key in _DEFAULT_REGION_CODES_TO_COORDINATES:
-        if region_code.lower() in key.lower():
+    region_code_lower = region_code.lower()
+    if "/" in region_code_lower:
+        candidates = _LOWERCASE_KEYS_BY_COUNTRY.get(region_code_lower.split("/")[0], ())
+    else:
+        candidates = _LOWERCASE_KEYS.items()
+    for lowercase_key, key in candidates:
+        if region_code_lower in lowercase_key:
             return _DEFAULT_REGION_CODES_TO_COORDINATES[key]
+    return None
+
+
+def _create_region_cache(conn):
+    """Create the `region_cache` table of OpenCage results if it does not exist yet."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS region_cache (
+            region_code VARCHAR PRIMARY KEY,
+            latitude DOUBLE,
+            longitude DOUBLE
+        )
+    """)
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_opencage_coordinates(region_code: str) -> dict:
+    """
+    Look up a region code with the OpenCage API, memoized per region code.
     
-    # use OpenCage API service to get coordinates
-    if opencage_api_key:
-        response = requests.get(
-            f"https://api.opencagedata.com/geocode/v1/json?q={region_code}&key={opencage_api_key}"
+    Raises LookupError when the request failed, so that failures are not memoized
+    and the region is requested again next time.
+    """
+    coordinates = _query_opencage(region_code, requests)
+    if coordinates is None:
+        raise LookupError(f"OpenCage request for {region_code!r} failed")
+    return coordinates
+
+
+def _query_opencage(region_code: str, session) -> Optional[dict]:
+    """Request the coordinates of a region code from OpenCage; None if the request itself failed."""
+    try:
+        response = session.get(
+            "https://api.opencagedata.com/geocode/v1/json",
+            params={"q": region_code, "key": opencage_api_key},
+            timeout=OPENCAGE_TIMEOUT,
         )
-        if response.status_code == 200:
-            data = response.json()
-            if data["results"]:
-                return {
-                    "latitude": data["results"][0]["geometry"]["lat"],
-                    "longitude": data["results"][0]["geometry"]["lng"],
-                }
+        if response.status_code != 200:
+            return None
+        data = response.json()
+    except requests.RequestException:
+        return None
+    if data["results"]:
+        return {
+            "latitude": data["results"][0]["geometry"]["lat"],
+            "longitude": data["results"][0]["geometry"]["lng"],
+        }
     return {"latitude": None, "longitude": None}
@@ -0,0 +1,148 @@
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client serving a small daily stats parquet file, with every data cache reset."""
+    rng = np.random.default_rng(0)
+    n_rows = 500
+    region_codes = np.array(['US/California', 'DE/Bavaria', "CI/Côte d'Ivoire", 'AWS/us-east-1', 'FR/Île-de-France'])
+    latitudes = np.array([36.7, 48.7, 7.5, 38.9, 48.8])
+    regions = rng.integers(0, len(region_codes), n_rows)
+    parquet_path = tmp_path / "daily_ip_dandiset_stats.parquet"
+    pd.DataFrame({
+        'dandiset_id': [f'{i:06d}' for i in rng.integers(1, 12, n_rows)],
+        'download_date': pd.to_datetime('2024-01-01') + pd.to_timedelta(rng.integers(0, 60, n_rows), unit='D'),
+        'total_bytes_downloaded': rng.integers(1, 2 ** 40, n_rows).astype(np.float64),
+        'region_code': region_codes[regions],
+        'country': [code.split('/')[0] for code in region_codes[regions]],
+        'latitude': latitudes[regions],
+        'longitude': -latitudes[regions],
+    }).to_parquet(parquet_path)
+
+    monkeypatch.setattr(app, 'PARQUET_PATH', str(parquet_path))
+    monkeypatch.setattr(app, '_df_cache', None)
+    monkeypatch.setattr(app, '_df_cache_timestamp', None)
+    monkeypatch.setattr(app, '_duckdb_conn', None)
+    for compute in (app._compute_global_downloads, app._compute_global_downloads_arrow, app._compute_regions):
+        compute.cache_clear()
+    return app.app.test_client()
+
+
+def reference_format_bytes(bytes_value):
+    """Format bytes by repeated division, as format_bytes did before format_bytes_array."""
+    bytes_value = float(bytes_value)
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB', 'PB']:
+        if bytes_value < 1024.0:
+            return f"{bytes_value:.1f} {unit}"
+        bytes_value /= 1024.0
+    return f"{bytes_value:.1f} EB"
+
+
+BOUNDARY_VALUES = [1024 ** exponent + offset for exponent in range(1, 8) for offset in (-1, 0, 1)]
+
+
+@pytest.mark.parametrize("bytes_value", [0, 0.5, 1, 1023, 2 ** 50 - 1, 2 ** 60 - 1, 10 ** 25] + BOUNDARY_VALUES)
+def test_format_bytes_matches_repeated_division(bytes_value):
+    assert app.format_bytes(bytes_value) == reference_format_bytes(bytes_value)
+
+
+def test_format_bytes_array_matches_format_bytes_per_value():
+    bytes_values = np.concatenate([BOUNDARY_VALUES, np.exp(np.random.default_rng(0).uniform(0, 60, 10_000))])
+    assert app.format_bytes_array(bytes_values).tolist() == [reference_format_bytes(v) for v in bytes_values]
+
+
+def test_format_bytes_array_formats_missing_values_as_zero():
+    assert app.format_bytes_array([np.nan, 2048]).tolist() == ["0 B", "2.0 KB"]
+    assert app.format_bytes(None) == "0 B"
+
+
+def reference_time_series(daily_data, key_column, top_keys):
+    """Build the time series with a pandas groupby, as build_time_series did before the bincount."""
+    keys = daily_data[key_column].astype(str)
+    keys = keys.where(keys.isin(top_keys), 'OTHER')
+    daily_totals = daily_data['total_bytes_downloaded'].groupby([daily_data['download_date'], keys]).sum().astype('int64')
+
+    time_series = []
+    for date, day_totals in daily_totals.groupby(level=0):
+        day_data = {'date': str(date), **dict.fromkeys(top_keys, 0)}
+        day_data.update(zip(day_totals.index.get_level_values(1), day_totals.tolist()))
+        if day_data.get('OTHER', 0) <= 0:
+            day_data.pop('OTHER', None)
+        time_series.append(day_data)
+    return time_series
+
+
+@pytest.fixture
+def daily_data():
+    rng = np.random.default_rng(0)
+    n_rows = 2_000
+    return pd.DataFrame({
+        'download_date': pd.date_range('2024-01-01', periods=90).astype(str)[rng.integers(0, 90, n_rows)],
+        'dandiset_id': [f'{i:06d}' for i in rng.integers(1, 20, n_rows)],
+        'total_bytes_downloaded': rng.integers(0, 2 ** 40, n_rows),
+    }).drop_duplicates(['download_date', 'dandiset_id'])
+
+
+def test_build_time_series_matches_groupby(daily_data):
+    top_keys = list(app.get_top_key_totals(daily_data, 'dandiset_id'))
+    assert len(top_keys) == 7
+    assert app.build_time_series(daily_data, 'dandiset_id', top_keys) == \
+        reference_time_series(daily_data, 'dandiset_id', top_keys)
+
+
+def test_build_time_series_omits_zero_other():
+    daily_data = pd.DataFrame({
+        'download_date': ['2024-01-01', '2024-01-01', '2024-01-02'],
+        'dandiset_id': ['000001', '000002', '000001'],
+        'total_bytes_downloaded': [5, 0, 7],
+    })
+    assert app.build_time_series(daily_data, 'dandiset_id', ['000001']) == [
+        {'date': '2024-01-01', '000001': 5},
+        {'date': '2024-01-02', '000001': 7},
+    ]
+
+
+@pytest.mark.parametrize("query", ["", "?dataset_id=000003", "?start_date=2024-01-10&end_date=2024-02-10"])
+def test_global_downloads_arrow_stream_matches_json(client, query):
+    json_payload = client.get(f'/api/downloads/global{query}').get_json()
+    response = client.get(f'/api/downloads/global{query}', headers={'Accept': app.ARROW_STREAM_MIMETYPE})
+    assert response.mimetype == app.ARROW_STREAM_MIMETYPE
+
+    table = pa.ipc.open_stream(response.data).read_all()
+    metadata = table.schema.metadata
+    assert orjson.loads(metadata[b'top_datasets']) == json_payload['top_datasets']
+    assert orjson.loads(metadata[b'dataset_totals']) == json_payload['dataset_totals']
+    assert metadata[b'view_type'].decode() == json_payload['view_type']
+
+    # The stream carries OTHER on every day; JSON leaves it out when it is zero
+    rows = [{key: value for key, value in row.items() if key != 'OTHER' or value > 0} for row in table.to_pylist()]
+    assert rows == json_payload['time_series']
+
+
+def test_regions_are_sorted_with_exact_totals(client, tmp_path, monkeypatch):
+    # Totals beyond 2**53 would lose their low bits if summed as doubles; the directory name
+    # also checks that a quote in the parquet path survives the view definition
+    parquet_path = tmp_path / "it's" / "daily_ip_dandiset_stats.parquet"
+    parquet_path.parent.mkdir()
+    pd.DataFrame({
+        'dandiset_id': ['000001', '000002', '000001', '000003'],
+        'download_date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-03']),
+        'total_bytes_downloaded': np.array([2 ** 53, 1, 1, 5], dtype=np.int64),
+        'region_code': ['US/California', 'US/California', 'US/California', 'DE/Bavaria'],
+        'country': ['US', 'US', 'US', 'DE'],
+        'latitude': [36.7, 36.7, 36.7, 48.7],
+        'longitude': [-119.4, -119.4, -119.4, 11.4],
+    }).to_parquet(parquet_path)
+    monkeypatch.setattr(app, 'PARQUET_PATH', str(parquet_path))
+
+    regions = client.get('/api/regions').get_json()
+    assert [region['code'] for region in regions] == ['DE/Bavaria', 'US/California']
+    assert [region['total_bytes'] for region in regions] == [5, 2 ** 53 + 2]
+    assert [region['dataset_count'] for region in regions] == [1, 2]
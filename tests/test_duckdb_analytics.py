@@ -0,0 +1,150 @@
+import datetime
+from types import SimpleNamespace
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import duckdb_analytics
+from duckdb_analytics import DuckDBAnalytics, load_yaml_mapping
+
+
+class FakeDandiAPIClient:
+    """Stand-in for DandiAPIClient serving a fixed set of dandisets, versions and assets."""
+
+    # Versions were last modified long ago, so an incremental rerun skips every processed one
+    modified = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def __init__(self, assets_by_version):
+        self.assets_by_version = assets_by_version
+        self.fetched_versions = []
+
+    def get_dandisets(self):
+        dandiset_ids = sorted({dandiset_id for dandiset_id, _ in self.assets_by_version})
+        return [SimpleNamespace(identifier=dandiset_id, get_versions=lambda d=dandiset_id: self._versions(d))
+                for dandiset_id in dandiset_ids]
+
+    def _versions(self, dandiset_id):
+        return [SimpleNamespace(identifier=version_id, modified=self.modified)
+                for d, version_id in self.assets_by_version if d == dandiset_id]
+
+    def get_dandiset(self, dandiset_id, version_id):
+        self.fetched_versions.append((dandiset_id, version_id))
+        assets = [SimpleNamespace(path=path, size=size, blob=blob_id)
+                  for blob_id, path, size in self.assets_by_version[(dandiset_id, version_id)]]
+        return SimpleNamespace(name=f"Dandiset {dandiset_id}", get_assets=lambda: assets)
+
+
+@pytest.fixture
+def dandi_client(monkeypatch):
+    client = FakeDandiAPIClient({
+        ("000001", "draft"): [("blob-1", "sub-1/a.nwb", 10), ("blob-2", "sub-1/b.nwb", 20)],
+        ("000001", "0.1"): [("blob-1", "sub-1/a.nwb", 10)],
+        ("000002", "draft"): [("blob-3", "sub-2/c.nwb", 30)],
+    })
+    monkeypatch.setattr(duckdb_analytics, "DandiAPIClient", lambda: client)
+    return client
+
+
+@pytest.fixture
+def analytics(tmp_path):
+    db = DuckDBAnalytics(db_path=str(tmp_path / "analytics.duckdb"),
+                         parquet_path=str(tmp_path / "database.parquet"),
+                         threads=1)
+    yield db
+    db.close()
+
+
+def test_downloads_base_parses_packed_dates_and_times(analytics):
+    pq.write_table(pa.table({
+        "blob_index": pa.array([0, 0, 1], type=pa.int64()),
+        "day": pa.array([240131, 241301, 240229], type=pa.int64()),
+        "time": pa.array([235959, 120000, 126100], type=pa.int64()),
+        "bytes_sent": pa.array([1, 2, 3], type=pa.int64()),
+        "indexed_ip": pa.array([7, 8, 9], type=pa.int64()),
+    }), analytics.parquet_path)
+    analytics.conn.execute("INSERT INTO blob_mapping VALUES (0, 'blob-a'), (1, 'blob-b')")
+
+    # One malformed month and one malformed minute become NULL instead of failing the build
+    analytics.create_analytics_views()
+
+    rows = analytics.conn.execute("""
+        SELECT bytes_sent, download_date, download_time FROM downloads_base ORDER BY bytes_sent
+    """).fetchall()
+    assert rows == [
+        (1, datetime.date(2024, 1, 31), datetime.time(23, 59, 59)),
+        (2, None, datetime.time(12, 0, 0)),
+        (3, datetime.date(2024, 2, 29), None),
+    ]
+
+
+def test_build_asset_mappings_incremental_rerun_skips_processed_versions(analytics, dandi_client, monkeypatch):
+    # Flush after every version so the rerun also covers rows written across several batches
+    monkeypatch.setattr(duckdb_analytics, "ASSET_FLUSH_ROWS", 1)
+    analytics.build_asset_mappings()
+    assert sorted(dandi_client.fetched_versions) == sorted(dandi_client.assets_by_version)
+
+    tables = ("dandisets", "dandiset_versions", "assets", "asset_dandiset_mappings")
+    counts = {table: analytics.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+    assert counts == {"dandisets": 2, "dandiset_versions": 3, "assets": 3, "asset_dandiset_mappings": 3}
+
+    dandi_client.fetched_versions.clear()
+    analytics.build_asset_mappings()
+    assert dandi_client.fetched_versions == []
+    assert {table: analytics.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables} == counts
+
+
+def test_build_asset_mappings_failed_flush_propagates(analytics, dandi_client, monkeypatch):
+    monkeypatch.setattr(duckdb_analytics, "ASSET_FLUSH_ROWS", 1)
+
+    def failing_flush(self, *pending):
+        self.conn.execute("SELECT CAST('not a number' AS INTEGER)")
+
+    monkeypatch.setattr(DuckDBAnalytics, "_flush_asset_rows", failing_flush)
+    with pytest.raises(duckdb.ConversionException):
+        analytics.build_asset_mappings()
+
+    # The transaction was rolled back, leaving the connection usable and nothing half-written
+    assert analytics.conn.execute("SELECT COUNT(*) FROM dandiset_versions").fetchone()[0] == 0
+
+
+def test_load_yaml_mapping_coerces_values_and_caches_them(tmp_path):
+    yaml_path = tmp_path / "mapping.yaml"
+    yaml_path.write_text("1: US/California\n2: 12345\n3: true\n4:\n")
+
+    expected = [
+        {"key": "1", "value": "US/California"},
+        {"key": "2", "value": "12345"},
+        {"key": "3", "value": "True"},
+        {"key": "4", "value": None},
+    ]
+    assert load_yaml_mapping(yaml_path).to_pylist() == expected
+    assert yaml_path.with_suffix(".parquet").exists()
+    assert load_yaml_mapping(yaml_path).to_pylist() == expected
+
+
+def test_load_ip_region_mapping_resolves_coordinates_only_when_asked(analytics, tmp_path, monkeypatch):
+    def no_requests(*args, **kwargs):
+        raise AssertionError("unexpected OpenCage request")
+
+    monkeypatch.setattr(duckdb_analytics, "resolve_regions", no_requests)
+    ip_path = tmp_path / "index_to_region.yaml"
+    ip_path.write_text("1: GCP/us-central1\n2: DE/Bavaria\n")
+    coordinates_path = tmp_path / "region_codes_to_coordinates.yaml"
+    coordinates_path.write_text("DE/Bavaria:\n  latitude: 48.7\n  longitude: 11.4\n")
+
+    analytics.load_ip_region_mapping(ip_path, coordinates_path)
+    coordinates = "SELECT region_code, latitude, longitude FROM regions ORDER BY region_code"
+    assert analytics.conn.execute(coordinates).fetchall() == [
+        ("DE/Bavaria", 48.7, 11.4),
+        ("GCP/us-central1", None, None),
+    ]
+
+    monkeypatch.setattr(duckdb_analytics, "resolve_regions",
+                        lambda region_codes, conn: {"GCP/us-central1": {"latitude": 41.2619, "longitude": -95.8608}})
+    analytics.load_ip_region_mapping(ip_path, coordinates_path, resolve_coordinates=True)
+    assert analytics.conn.execute(coordinates).fetchall() == [
+        ("DE/Bavaria", 48.7, 11.4),
+        ("GCP/us-central1", 41.2619, -95.8608),
+    ]
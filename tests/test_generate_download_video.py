@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from generate_download_video import DownloadVideoGenerator
+
+
+def reference_format_bytes(bytes_value):
+    """Format bytes by repeated division, as format_bytes did before picking the unit from log2."""
+    if bytes_value == 0:
+        return "0 B"
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB', 'PB']:
+        if bytes_value < 1024.0:
+            return f"{bytes_value:.1f} {unit}"
+        bytes_value /= 1024.0
+    return f"{bytes_value:.1f} EB"
+
+
+@pytest.fixture(scope="module")
+def generator(tmp_path_factory):
+    return DownloadVideoGenerator(output_dir=tmp_path_factory.mktemp("frames"))
+
+
+@pytest.mark.parametrize("exponent", range(1, 8))
+@pytest.mark.parametrize("offset", [-1, 0, 1])
+def test_format_bytes_at_unit_boundaries(generator, exponent, offset):
+    bytes_value = 1024 ** exponent + offset
+    assert generator.format_bytes(bytes_value) == reference_format_bytes(bytes_value)
+
+
+@pytest.mark.parametrize("bytes_value", [0, 0.5, 1, 1023, -5, -5000, 2 ** 50 - 1, 2 ** 60 - 1, 10 ** 25,
+                                         np.int64(2 ** 62), np.float32(3e9)])
+def test_format_bytes_matches_repeated_division(generator, bytes_value):
+    assert generator.format_bytes(bytes_value) == reference_format_bytes(bytes_value)
+
+
+def test_format_bytes_just_below_a_unit_stays_in_the_smaller_unit(generator):
+    assert generator.format_bytes(2 ** 50 - 1) == "1024.0 TB"
+    assert generator.format_bytes(1024 ** 3) == "1.0 GB"
+
+
+def test_format_bytes_random_values(generator):
+    for bytes_value in np.exp(np.random.default_rng(0).uniform(0, 60, 10_000)):
+        assert generator.format_bytes(bytes_value) == reference_format_bytes(bytes_value)
+
+
+def test_gif_palette_is_none_without_weeks(generator):
+    assert generator.create_gif_palette({}) is None
+
+
+def test_create_gif_skips_empty_frames(generator, tmp_path):
+    output_path = tmp_path / "empty.gif"
+    generator.create_gif([], output_path)
+    assert not output_path.exists()
+
+
+def test_create_video_quantizes_frames_without_shared_palette(generator, tmp_path):
+    frames = [np.full((16, 16, 3), value, dtype=np.uint8) for value in (0, 128, 255)]
+    gif_frames = generator.create_video(iter(frames), tmp_path / "video.mp4", fps=2, gif_palette=None)
+    assert [frame.mode for frame in gif_frames] == ["P"] * 3
+    generator.create_gif(gif_frames, tmp_path / "video.gif")
+    assert (tmp_path / "video.gif").exists()
+
+
+def test_snapshot_files_are_removed_when_frame_generation_fails(tmp_path, monkeypatch):
+    parquet_path = tmp_path / "downloads.parquet"
+    pd.DataFrame({
+        "download_date": ["2024-01-01", "2024-01-09"],
+        "region": ["US/California", "DE/Bavaria"],
+        "latitude": [36.7, 48.7],
+        "longitude": [-119.4, 11.4],
+        "dandiset_id": ["000001", "000002"],
+        "total_bytes_sent": [2048, 4096],
+    }).to_parquet(parquet_path)
+    generator = DownloadVideoGenerator(parquet_path, output_dir=tmp_path / "frames")
+    
+    def failing_frames(snapshots):
+        assert all(path.exists() for path in snapshots.values())
+        raise RuntimeError("worker failed")
+    
+    monkeypatch.setattr(generator, "generate_frames", failing_frames)
+    monkeypatch.setattr(generator, "create_gif_palette", lambda snapshots: None)
+    with pytest.raises(RuntimeError, match="worker failed"):
+        generator.generate_video(tmp_path / "video.mp4", tmp_path / "video.gif")
+    assert not (tmp_path / "frames").exists()
@@ -0,0 +1,91 @@
+import duckdb
+import pytest
+import requests
+
+import known_regions
+from known_regions import get_region_coordinates, resolve_regions
+
+
+class FakeResponse:
+    def __init__(self, status_code, latitude=None):
+        self.status_code = status_code
+        self.latitude = latitude
+
+    def json(self):
+        if self.latitude is None:
+            return {"results": []}
+        return {"results": [{"geometry": {"lat": self.latitude, "lng": 1.0}}]}
+
+
+@pytest.fixture
+def opencage(monkeypatch):
+    """Route OpenCage requests to a fake that answers per region code and records each request."""
+    requested = []
+    responses = {
+        "ZZ/Found": FakeResponse(200, 5.0),
+        "ZZ/Nowhere": FakeResponse(200),
+        "ZZ/Busy": FakeResponse(429),
+    }
+
+    def get(url, params, timeout):
+        assert timeout == known_regions.OPENCAGE_TIMEOUT
+        requested.append(params["q"])
+        if params["q"] == "ZZ/Reset":
+            raise requests.ConnectionError("connection reset")
+        return responses[params["q"]]
+
+    monkeypatch.setattr(known_regions, "opencage_api_key", "test-key")
+    monkeypatch.setattr(requests, "get", get)
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, params, timeout: get(url, params, timeout))
+    known_regions._get_opencage_coordinates.cache_clear()
+    yield requested
+    known_regions._get_opencage_coordinates.cache_clear()
+
+
+def test_resolve_regions_uses_known_regions_without_requests(opencage):
+    resolved = resolve_regions(["AWS/us-east-2", "GitHub", "AWS/us-east-2"])
+    assert resolved == {
+        "AWS/us-east-2": {"latitude": 39.9612, "longitude": -82.9988},
+        "GitHub": {"latitude": None, "longitude": None},
+    }
+    assert opencage == []
+
+
+def test_resolve_regions_caches_successful_lookups_only(opencage):
+    conn = duckdb.connect()
+    region_codes = ["ZZ/Found", "ZZ/Nowhere", "ZZ/Busy", "ZZ/Reset"]
+
+    resolved = resolve_regions(region_codes, conn=conn)
+    assert resolved["ZZ/Found"] == {"latitude": 5.0, "longitude": 1.0}
+    assert resolved["ZZ/Nowhere"] == resolved["ZZ/Busy"] == resolved["ZZ/Reset"] == {"latitude": None, "longitude": None}
+    assert sorted(opencage) == sorted(region_codes)
+
+    # Answered regions, including ones without a result, come from the cache; failed requests are retried
+    opencage.clear()
+    assert resolve_regions(region_codes, conn=conn) == resolved
+    assert sorted(opencage) == ["ZZ/Busy", "ZZ/Reset"]
+    assert conn.execute("SELECT * FROM region_cache ORDER BY region_code").fetchall() == [
+        ("ZZ/Found", 5.0, 1.0),
+        ("ZZ/Nowhere", None, None),
+    ]
+
+
+def test_get_region_coordinates_reads_and_fills_region_cache(opencage):
+    conn = duckdb.connect()
+    assert get_region_coordinates("ZZ/Found", conn=conn) == {"latitude": 5.0, "longitude": 1.0}
+    assert conn.execute("SELECT * FROM region_cache").fetchall() == [("ZZ/Found", 5.0, 1.0)]
+
+    known_regions._get_opencage_coordinates.cache_clear()
+    opencage.clear()
+    assert get_region_coordinates("ZZ/Found", conn=conn) == {"latitude": 5.0, "longitude": 1.0}
+    assert opencage == []
+
+
+def test_get_region_coordinates_does_not_memoize_failures(opencage):
+    assert get_region_coordinates("ZZ/Busy") == {"latitude": None, "longitude": None}
+    assert get_region_coordinates("ZZ/Busy") == {"latitude": None, "longitude": None}
+    assert opencage == ["ZZ/Busy", "ZZ/Busy"]
+
+    assert get_region_coordinates("ZZ/Found") == {"latitude": 5.0, "longitude": 1.0}
+    assert get_region_coordinates("ZZ/Found") == {"latitude": 5.0, "longitude": 1.0}
+    assert opencage.count("ZZ/Found") == 1